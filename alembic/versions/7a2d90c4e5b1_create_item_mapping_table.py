@@ -0,0 +1,42 @@
+"""create item mapping table
+
+Revision ID: 7a2d90c4e5b1
+Revises: e67f6a32a9dc
+Create Date: 2026-10-17 11:20:05.114382
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2d90c4e5b1'
+down_revision: Union[str, None] = 'e67f6a32a9dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "items",
+        sa.Column("id", postgresql.UUID(as_uuid=True), default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column("woo_product_id", sa.Integer(), nullable=False),
+        sa.Column("woo_variation_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sku", sa.String(), nullable=True),
+        sa.Column("zoho_item_id", sa.String(), nullable=False),
+        sa.Column("zoho_group_id", sa.String(), nullable=True),
+        sa.Column("content_hash", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("woo_product_id", "woo_variation_id", name="uq_items_woo_product_variation"),
+    )
+    op.create_index("ix_items_woo_product_id", "items", ["woo_product_id"])
+    op.create_index("ix_items_sku", "items", ["sku"])
+    op.create_index("ix_items_zoho_item_id", "items", ["zoho_item_id"], unique=True)
+    op.create_index("ix_items_zoho_group_id", "items", ["zoho_group_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("items")
@@ -0,0 +1,37 @@
+"""create synced orders table
+
+Revision ID: b4f1c8d2a6e3
+Revises: 7a2d90c4e5b1
+Create Date: 2026-10-17 14:02:41.538120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f1c8d2a6e3'
+down_revision: Union[str, None] = '7a2d90c4e5b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "synced_orders",
+        sa.Column("id", postgresql.UUID(as_uuid=True), default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column("woo_order_id", sa.Integer(), nullable=False),
+        sa.Column("zoho_salesorder_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("payload_hash", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_synced_orders_woo_order_id", "synced_orders", ["woo_order_id"], unique=True)
+    op.create_index("ix_synced_orders_zoho_salesorder_id", "synced_orders", ["zoho_salesorder_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("synced_orders")
@@ -0,0 +1,41 @@
+"""unique woo_id indexes
+
+Revision ID: c3e1f4a9b27d
+Revises: 5bf49f57fcab
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e1f4a9b27d'
+down_revision: Union[str, None] = '5bf49f57fcab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def find_duplicates(table: str) -> list[str]:
+    rows = op.get_bind().execute(sa.text(
+        f"SELECT woo_id, array_agg(id::text || ' (zoho_id ' || zoho_id::text || ')' ORDER BY id) FROM {table} GROUP BY woo_id HAVING COUNT(*) > 1 ORDER BY woo_id"
+    )).all()
+    return [f"{table}.woo_id={key}: {', '.join(entries)}" for key, entries in rows]
+
+
+def upgrade() -> None:
+    # Which duplicate mapping is the real one can't be decided here, so stop and let them be fixed by hand
+    duplicates = find_duplicates("categories") + find_duplicates("customers")
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot add unique woo_id indexes, remove the duplicate rows first:\n" + "\n".join(duplicates)
+        )
+    op.create_index("ix_categories_woo_id", "categories", ["woo_id"], unique=True)
+    op.create_index("ix_customers_woo_id", "customers", ["woo_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_customers_woo_id", table_name="customers")
+    op.drop_index("ix_categories_woo_id", table_name="categories")
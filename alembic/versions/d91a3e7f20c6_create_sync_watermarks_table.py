@@ -0,0 +1,34 @@
+"""create sync watermarks table
+
+Revision ID: d91a3e7f20c6
+Revises: b4f1c8d2a6e3
+Create Date: 2026-10-17 15:37:12.804417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91a3e7f20c6'
+down_revision: Union[str, None] = 'b4f1c8d2a6e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_watermarks",
+        sa.Column("id", postgresql.UUID(as_uuid=True), default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sync_watermarks_source", "sync_watermarks", ["source"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("sync_watermarks")
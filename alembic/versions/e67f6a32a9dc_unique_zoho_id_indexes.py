@@ -0,0 +1,41 @@
+"""unique zoho_id indexes
+
+Revision ID: e67f6a32a9dc
+Revises: c3e1f4a9b27d
+Create Date: 2026-10-17 10:03:17.540921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e67f6a32a9dc'
+down_revision: Union[str, None] = 'c3e1f4a9b27d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def find_duplicates(table: str) -> list[str]:
+    rows = op.get_bind().execute(sa.text(
+        f"SELECT zoho_id, array_agg(id::text || ' (woo_id ' || woo_id::text || ')' ORDER BY id) FROM {table} GROUP BY zoho_id HAVING COUNT(*) > 1 ORDER BY zoho_id"
+    )).all()
+    return [f"{table}.zoho_id={key}: {', '.join(entries)}" for key, entries in rows]
+
+
+def upgrade() -> None:
+    # Which duplicate mapping is the real one can't be decided here, so stop and let them be fixed by hand
+    duplicates = find_duplicates("categories") + find_duplicates("customers")
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot add unique zoho_id indexes, remove the duplicate rows first:\n" + "\n".join(duplicates)
+        )
+    op.create_index("ix_categories_zoho_id", "categories", ["zoho_id"], unique=True)
+    op.create_index("ix_customers_zoho_id", "customers", ["zoho_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_customers_zoho_id", table_name="customers")
+    op.drop_index("ix_categories_zoho_id", table_name="categories")
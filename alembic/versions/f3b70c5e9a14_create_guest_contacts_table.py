@@ -0,0 +1,38 @@
+"""create guest contacts table
+
+Revision ID: f3b70c5e9a14
+Revises: d91a3e7f20c6
+Create Date: 2026-10-17 16:48:30.219573
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b70c5e9a14'
+down_revision: Union[str, None] = 'd91a3e7f20c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "guest_contacts",
+        sa.Column("id", postgresql.UUID(as_uuid=True), default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column("identity", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("zoho_id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_guest_contacts_identity", "guest_contacts", ["identity"], unique=True)
+    op.create_index("ix_guest_contacts_zoho_id", "guest_contacts", ["zoho_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("guest_contacts")
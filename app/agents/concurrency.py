@@ -0,0 +1,65 @@
+import asyncio, time
+from collections import deque
+
+class AdaptiveLimiter:
+    """AIMD limit on the number of in-flight calls to one upstream.
+
+    The limit grows by roughly one slot per round of successful calls and is
+    cut multiplicatively on 429/5xx responses, transport errors, or when the
+    p95 latency of recent calls rises above `latency_target` seconds.
+    """
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int, latency_target: float, backoff: float = 0.5, window: int = 100):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    def p95(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool):
+        async with self.condition:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            # Latency only counts once there are enough samples for a meaningful p95
+            slow = len(self.latencies) >= 20 and self.p95() > self.latency_target
+            if overloaded or slow:
+                self._decrease()
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def _decrease(self):
+        now = time.monotonic()
+        # Cut at most once per round trip, so a burst of failures from one window counts once
+        if now - self.last_decrease < max(self.p95(), 1.0):
+            return
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        self.last_decrease = now
+        print(f"{self.name}: concurrency limit lowered to {int(self.limit)} (p95 {self.p95():.2f}s)")
+
+    async def call(self, fn):
+        """Run `fn()` (a coroutine factory returning a response) inside a slot."""
+        await self.acquire()
+        started = time.monotonic()
+        overloaded = True
+        try:
+            response = await fn()
+            overloaded = response.status_code == 429 or response.status_code >= 500
+            return response
+        finally:
+            await self.release(time.monotonic() - started, overloaded)
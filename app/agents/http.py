@@ -0,0 +1,48 @@
+import httpx
+
+from app.config import settings
+
+# Process-wide clients, created on first use and closed from the app lifespan.
+_zoho_client: httpx.AsyncClient | None = None
+_wcm_client: httpx.AsyncClient | None = None
+
+def get_zoho_client() -> httpx.AsyncClient:
+    global _zoho_client
+    if _zoho_client is None or _zoho_client.is_closed:
+        _zoho_client = httpx.AsyncClient(
+            base_url=settings.ZOHO_API_URL,
+            limits=httpx.Limits(
+                max_connections=settings.ZOHO_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ZOHO_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.ZOHO_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.ZOHO_HTTP_TIMEOUT, connect=settings.ZOHO_HTTP_CONNECT_TIMEOUT),
+        )
+    return _zoho_client
+
+def get_wcm_client() -> httpx.AsyncClient:
+    global _wcm_client
+    if _wcm_client is None or _wcm_client.is_closed:
+        _wcm_client = httpx.AsyncClient(
+            base_url=f"{settings.WCM_URL.rstrip('/')}/wp-json/wc/v3/",
+            # Same auth as woocommerce.API over HTTPS: consumer key/secret as basic auth
+            auth=(settings.WCM_CONSUMER_KEY, settings.WCM_CONSUMER_SECRET),
+            headers={"User-Agent": "woo-zoho-sync", "Accept": "application/json"},
+            verify=settings.WCM_VERIFY_SSL,
+            limits=httpx.Limits(
+                max_connections=settings.WCM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.WCM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.WCM_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.WCM_HTTP_TIMEOUT, connect=settings.WCM_HTTP_CONNECT_TIMEOUT),
+        )
+    return _wcm_client
+
+async def close_clients():
+    global _zoho_client, _wcm_client
+    if _zoho_client is not None:
+        await _zoho_client.aclose()
+        _zoho_client = None
+    if _wcm_client is not None:
+        await _wcm_client.aclose()
+        _wcm_client = None
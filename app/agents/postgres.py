@@ -1,16 +1,72 @@
-from sqlmodel import select
+import asyncio, hashlib, json, time, uuid
+from sqlmodel import select, col
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from datetime import datetime
 
 from app.config import settings
 from app.models.oauth import OAuth
 from app.models.category import Category, CategoryBase
 from app.models.customer import Customer, CustomerBase
+from app.models.item import ItemMapping, ItemMappingBase
+from app.models.synced_order import SyncedOrder, SyncedOrderBase
+from app.models.sync_watermark import SyncWatermark
+from app.models.guest_contact import GuestContact, GuestContactBase
+
+def content_hash(payload) -> str:
+    """Stable hash of a JSON-serialisable payload, used to detect changed records."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+# One engine (and connection pool) per process, shared by every PostgresAgent
+_engine: AsyncEngine | None = None
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        connect_args = {}
+        if settings.DATABASE_URL.startswith("postgresql+asyncpg"):
+            connect_args["prepared_statement_cache_size"] = settings.DATABASE_STATEMENT_CACHE_SIZE
+        _engine = create_async_engine(
+            settings.DATABASE_URL,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args=connect_args,
+        )
+    return _engine
+
+async def dispose_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+class CategoryCache:
+    """Process-wide woo_id -> zoho_id map of every category, reloaded after CATEGORY_CACHE_TTL seconds."""
+    def __init__(self):
+        self.zoho_ids: dict[int, str] = {}
+        self.loaded_at: float | None = None
+        self.lock = asyncio.Lock()
+    
+    def is_fresh(self):
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < settings.CATEGORY_CACHE_TTL
+    
+    def update(self, woo_id: int | None, zoho_id: str | None):
+        # Nothing to patch until the first load; that load will pick the row up
+        if self.loaded_at is not None and woo_id is not None:
+            self.zoho_ids[woo_id] = zoho_id
+    
+    def invalidate(self):
+        self.loaded_at = None
+
+category_cache = CategoryCache()
 
 class PostgresAgent:
     def __init__(self):
-        self.engine = create_async_engine(settings.DATABASE_URL)
+        self.engine = get_engine()
 
     async def get_session(self):
         async with AsyncSession(self.engine) as session:
@@ -71,9 +127,49 @@ class PostgresAgent:
             db.add(db_category)
             await db.commit()
             await db.refresh(db_category)
+            category_cache.update(db_category.woo_id, db_category.zoho_id)
             return db_category
         return None
     
+    async def upsert_categories(self, categories: list[CategoryBase], batch_size: int = 1000):
+        """Insert or update many categories keyed by woo_id, one statement per batch."""
+        # The last record wins if a woo_id appears twice; ON CONFLICT can't touch a row twice
+        rows = list({
+            category.woo_id: {"id": uuid.uuid4(), **category.model_dump()}
+            for category in categories
+        }.values())
+        
+        async for db in self.get_session():
+            for start in range(0, len(rows), batch_size):
+                statement = insert(Category).values(rows[start:start + batch_size])
+                statement = statement.on_conflict_do_update(
+                    index_elements=[Category.woo_id],
+                    set_={field: statement.excluded[field] for field in CategoryBase.model_fields if field != "woo_id"},
+                )
+                await db.exec(statement)
+            await db.commit()
+        
+        for row in rows:
+            category_cache.update(row["woo_id"], row["zoho_id"])
+        return len(rows)
+    
+    async def load_category_cache(self):
+        async for db in self.get_session():
+            result = (await db.exec(select(Category.woo_id, Category.zoho_id))).all()
+            category_cache.zoho_ids = {woo_id: zoho_id for woo_id, zoho_id in result}
+            category_cache.loaded_at = time.monotonic()
+    
+    def invalidate_category_cache(self):
+        category_cache.invalidate()
+    
+    async def get_category_zoho_id(self, woo_id: int) -> str | None:
+        """Resolve a Woo category to its Zoho id from the in-memory cache, loading it if stale."""
+        if not category_cache.is_fresh():
+            async with category_cache.lock:
+                if not category_cache.is_fresh():
+                    await self.load_category_cache()
+        return category_cache.zoho_ids.get(woo_id)
+    
     async def get_category_by_woo_id(self, woo_id: int):
         async for db in self.get_session():
             statement = select(Category).where(Category.woo_id == woo_id)
@@ -81,6 +177,22 @@ class PostgresAgent:
             return result
         return None
     
+    async def get_category_by_zoho_id(self, zoho_id: str):
+        async for db in self.get_session():
+            statement = select(Category).where(Category.zoho_id == zoho_id)
+            result = (await db.exec(statement)).first()
+            return result
+        return None
+    
+    async def get_categories_by_woo_ids(self, woo_ids: list[int]) -> dict[int, Category]:
+        if not woo_ids:
+            return {}
+        async for db in self.get_session():
+            statement = select(Category).where(col(Category.woo_id).in_(set(woo_ids)))
+            result = (await db.exec(statement)).all()
+            return {category.woo_id: category for category in result}
+        return {}
+    
     async def insert_customer(self, customer: CustomerBase):
         async for db in self.get_session():
             db_customer = Customer(
@@ -92,9 +204,169 @@ class PostgresAgent:
             await db.commit()
             await db.refresh(db_customer)
     
+    async def upsert_customers(self, customers: list[CustomerBase], batch_size: int = 1000):
+        """Insert or update many customers keyed by woo_id, one statement per batch."""
+        rows = list({
+            customer.woo_id: {"id": uuid.uuid4(), **customer.model_dump()}
+            for customer in customers
+        }.values())
+        
+        async for db in self.get_session():
+            for start in range(0, len(rows), batch_size):
+                statement = insert(Customer).values(rows[start:start + batch_size])
+                statement = statement.on_conflict_do_update(
+                    index_elements=[Customer.woo_id],
+                    set_={field: statement.excluded[field] for field in CustomerBase.model_fields if field != "woo_id"},
+                )
+                await db.exec(statement)
+            await db.commit()
+        return len(rows)
+    
     async def get_customer_by_woo_id(self, woo_id: int):
         async for db in self.get_session():
             statement = select(Customer).where(Customer.woo_id == woo_id)
             result = (await db.exec(statement)).first()
             return result
         return None
+    
+    async def get_customer_by_zoho_id(self, zoho_id: str):
+        async for db in self.get_session():
+            statement = select(Customer).where(Customer.zoho_id == zoho_id)
+            result = (await db.exec(statement)).first()
+            return result
+        return None
+    
+    async def get_customers_by_woo_ids(self, woo_ids: list[int]) -> dict[int, Customer]:
+        if not woo_ids:
+            return {}
+        async for db in self.get_session():
+            statement = select(Customer).where(col(Customer.woo_id).in_(set(woo_ids)))
+            result = (await db.exec(statement)).all()
+            return {customer.woo_id: customer for customer in result}
+        return {}
+    
+    async def upsert_items(self, items: list[ItemMappingBase], batch_size: int = 1000):
+        """Insert or update item mappings keyed by (woo_product_id, woo_variation_id)."""
+        rows = list({
+            (item.woo_product_id, item.woo_variation_id): {"id": uuid.uuid4(), **item.model_dump()}
+            for item in items
+        }.values())
+        
+        async for db in self.get_session():
+            for start in range(0, len(rows), batch_size):
+                statement = insert(ItemMapping).values(rows[start:start + batch_size])
+                statement = statement.on_conflict_do_update(
+                    index_elements=[ItemMapping.woo_product_id, ItemMapping.woo_variation_id],
+                    set_={
+                        field: statement.excluded[field]
+                        for field in ItemMappingBase.model_fields
+                        if field not in ("woo_product_id", "woo_variation_id")
+                    },
+                )
+                await db.exec(statement)
+            await db.commit()
+        return len(rows)
+    
+    async def get_item_by_woo_id(self, woo_product_id: int, woo_variation_id: int = 0):
+        async for db in self.get_session():
+            statement = select(ItemMapping).where(
+                ItemMapping.woo_product_id == woo_product_id,
+                ItemMapping.woo_variation_id == woo_variation_id
+            )
+            result = (await db.exec(statement)).first()
+            return result
+        return None
+    
+    async def get_item_by_sku(self, sku: str):
+        async for db in self.get_session():
+            statement = select(ItemMapping).where(ItemMapping.sku == sku)
+            result = (await db.exec(statement)).first()
+            return result
+        return None
+    
+    async def get_item_by_zoho_id(self, zoho_item_id: str):
+        async for db in self.get_session():
+            statement = select(ItemMapping).where(ItemMapping.zoho_item_id == zoho_item_id)
+            result = (await db.exec(statement)).first()
+            return result
+        return None
+    
+    async def get_items_by_woo_product_ids(self, woo_product_ids: list[int]) -> list[ItemMapping]:
+        if not woo_product_ids:
+            return []
+        async for db in self.get_session():
+            statement = select(ItemMapping).where(col(ItemMapping.woo_product_id).in_(set(woo_product_ids)))
+            return list((await db.exec(statement)).all())
+        return []
+    
+    async def upsert_synced_order(self, synced_order: SyncedOrderBase):
+        async for db in self.get_session():
+            statement = insert(SyncedOrder).values(id=uuid.uuid4(), **synced_order.model_dump())
+            statement = statement.on_conflict_do_update(
+                index_elements=[SyncedOrder.woo_order_id],
+                set_={
+                    field: statement.excluded[field]
+                    for field in SyncedOrderBase.model_fields
+                    if field != "woo_order_id"
+                },
+            )
+            await db.exec(statement)
+            await db.commit()
+    
+    async def add_synced_orders(self, synced_orders: list[SyncedOrderBase], batch_size: int = 1000):
+        """Insert ledger entries for orders not in it yet; existing entries are left untouched."""
+        rows = list({
+            synced_order.woo_order_id: {"id": uuid.uuid4(), **synced_order.model_dump()}
+            for synced_order in synced_orders
+        }.values())
+        
+        async for db in self.get_session():
+            for start in range(0, len(rows), batch_size):
+                statement = insert(SyncedOrder).values(rows[start:start + batch_size])
+                await db.exec(statement.on_conflict_do_nothing(index_elements=[SyncedOrder.woo_order_id]))
+            await db.commit()
+        return len(rows)
+    
+    async def get_synced_orders(self, woo_order_ids: list[int]) -> dict[int, SyncedOrder]:
+        """Ledger entries for the given Woo orders, keyed by woo_order_id; one query per batch."""
+        if not woo_order_ids:
+            return {}
+        async for db in self.get_session():
+            statement = select(SyncedOrder).where(col(SyncedOrder.woo_order_id).in_(set(woo_order_ids)))
+            return {order.woo_order_id: order for order in (await db.exec(statement)).all()}
+        return {}
+    
+    async def get_watermark(self, source: str) -> str | None:
+        async for db in self.get_session():
+            statement = select(SyncWatermark).where(SyncWatermark.source == source)
+            result = (await db.exec(statement)).first()
+            return result.value if result else None
+        return None
+    
+    async def set_watermark(self, source: str, value: str):
+        async for db in self.get_session():
+            statement = insert(SyncWatermark).values(id=uuid.uuid4(), source=source, value=value)
+            statement = statement.on_conflict_do_update(
+                index_elements=[SyncWatermark.source],
+                set_={"value": statement.excluded.value},
+            )
+            await db.exec(statement)
+            await db.commit()
+    
+    async def upsert_guest_contact(self, contact: GuestContactBase):
+        async for db in self.get_session():
+            statement = insert(GuestContact).values(id=uuid.uuid4(), **contact.model_dump())
+            statement = statement.on_conflict_do_update(
+                index_elements=[GuestContact.identity],
+                set_={field: statement.excluded[field] for field in GuestContactBase.model_fields if field != "identity"},
+            )
+            await db.exec(statement)
+            await db.commit()
+    
+    async def get_guest_contacts(self, identities: list[str]) -> dict[str, GuestContact]:
+        if not identities:
+            return {}
+        async for db in self.get_session():
+            statement = select(GuestContact).where(col(GuestContact.identity).in_(set(identities)))
+            return {contact.identity: contact for contact in (await db.exec(statement)).all()}
+        return {}
@@ -0,0 +1,68 @@
+import asyncio, time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+DAY_SECONDS = 24 * 60 * 60
+
+class RateLimiter:
+    """Token bucket with a per-minute rate and a rolling per-day budget.
+
+    Every call waits in `acquire` until a token is available. A 429 from the
+    upstream should call `pause` so all waiters hold off until it has passed.
+    """
+    def __init__(self, per_minute: int, per_day: int = 0):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+        self.day_started_at = self.updated_at
+        self.day_count = 0
+        self.paused_until = 0.0
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(float(self.per_minute), self.tokens + (now - self.updated_at) * self.per_minute / 60)
+        self.updated_at = now
+        if now - self.day_started_at >= DAY_SECONDS:
+            self.day_started_at = now
+            self.day_count = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.per_day and self.day_count >= self.per_day:
+                    wait = self.day_started_at + DAY_SECONDS - now
+                    print(f"Daily API budget of {self.per_day} calls used, resuming in {wait:.0f}s")
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.day_count += 1
+                    return
+                else:
+                    wait = (1 - self.tokens) * 60 / self.per_minute
+
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        # Resume gently instead of bursting the whole bucket at once
+        self.tokens = 0.0
+
+def retry_after_seconds(value: str | None, default: float) -> float:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,51 @@
+import asyncio, random, time
+import httpx
+
+from app.agents.ratelimit import retry_after_seconds
+
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+class UpstreamError(Exception):
+    """A request failed with a non-retryable status or after the retry policy gave up."""
+    def __init__(self, message: str, response: httpx.Response | None = None):
+        super().__init__(message)
+        self.response = response
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped by attempts and an overall deadline."""
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 30.0, deadline: float = 120.0, retryable_status_codes=RETRYABLE_STATUS_CODES):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retryable_status_codes = retryable_status_codes
+
+    def is_retryable(self, status_code: int) -> bool:
+        return status_code in self.retryable_status_codes
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, fn) -> httpx.Response:
+        """Await `fn()` until it returns a non-retryable response; raise UpstreamError when giving up."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            response = None
+            retry_after = None
+            try:
+                response = await fn()
+                if not self.is_retryable(response.status_code):
+                    return response
+                reason = f"status {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                reason = f"{type(e).__name__}: {str(e)}"
+
+            attempt += 1
+            delay = max(self.backoff(attempt), retry_after_seconds(retry_after, 0.0))
+            if attempt >= self.max_attempts or time.monotonic() - started + delay > self.deadline:
+                raise UpstreamError(f"Gave up after {attempt} attempts ({reason})", response)
+
+            print(f"Retrying in {delay:.1f}s after {reason} (attempt {attempt}/{self.max_attempts})")
+            await asyncio.sleep(delay)
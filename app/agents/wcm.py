@@ -1,47 +1,145 @@
-import asyncio, json, os
-from woocommerce import API
-from concurrent.futures import ThreadPoolExecutor
+import asyncio, json
+from datetime import datetime, timedelta
 
+from app.agents.concurrency import AdaptiveLimiter
 from app.agents.postgres import PostgresAgent
+from app.agents.retry import RetryPolicy, UpstreamError
+from app.agents.woo import WooClient
 from app.config import settings
+from app.store.catalog import catalog
+from app.store.snapshot import SnapshotWriter, delete_snapshot, read_snapshot, snapshot_path, write_snapshot
+
+# Shared by every WcmAgent so the in-flight limit tracks the shop, not the instance
+concurrency = AdaptiveLimiter(
+    "woocommerce",
+    settings.WCM_CONCURRENCY_INITIAL,
+    settings.WCM_CONCURRENCY_MIN,
+    settings.WCM_CONCURRENCY_MAX,
+    settings.WCM_LATENCY_TARGET,
+)
+
+retry_policy = RetryPolicy(
+    max_attempts=settings.WCM_RETRY_MAX_ATTEMPTS,
+    base_delay=settings.WCM_RETRY_BASE_DELAY,
+    max_delay=settings.WCM_RETRY_MAX_DELAY,
+    deadline=settings.WCM_RETRY_DEADLINE,
+)
 
 class WcmAgent:
     def __init__(self):
         self.postgres_agent = PostgresAgent()
-        self.wcapi = API(
-            url=settings.WCM_URL,
-            consumer_key=settings.WCM_CONSUMER_KEY,
-            consumer_secret=settings.WCM_CONSUMER_SECRET,
-            wp_api=True,
-            version="wc/v3",
-            timeout=30,
-            verify=False
-        )
+        self.wcapi = WooClient()
+    
+    async def request(self, method: str, endpoint: str, *args, **kwargs):
+        call = getattr(self.wcapi, method)
+        return await concurrency.call(lambda: call(endpoint, *args, **kwargs))
+        
+    async def get(self, endpoint: str, params: dict | None = None):
+        """GET with the shared retry policy; raises UpstreamError unless the answer is a 200."""
+        response = await retry_policy.run(lambda: self.request("get", endpoint, params=params))
+        if response.status_code != 200:
+            raise UpstreamError(f"GET {endpoint} failed with status {response.status_code}: {response.text[:200]}", response)
+        return response
+    
+    async def get_page(self, endpoint: str, params: dict, page: int):
+        return await self.get(endpoint, {**params, "page": page})
+    
+    async def iter_pages(self, endpoint: str, params: dict | None = None, per_page: int = 100):
+        """Yield every page of a WooCommerce list endpoint, in page order.
+
+        The first response's X-WP-TotalPages header gives the page count; the remaining
+        pages are then fetched through a sliding window of at most WCM_PAGE_CONCURRENCY
+        pages ahead of the one being yielded, so a slow page can't make later ones pile up.
+        A page that still fails after retries is skipped.
+        """
+        params = {**(params or {}), "per_page": per_page}
+        first = await self.get_page(endpoint, params, 1)
+        total_pages = int(first.headers.get("X-WP-TotalPages", 1))
+        print(f"{endpoint}: {first.headers.get('X-WP-Total', '?')} records in {total_pages} pages")
+        yield first.json()
+        
+        window = max(1, settings.WCM_PAGE_CONCURRENCY)
+        tasks = {}
+        next_page = 2
+        failed_pages = []
+        try:
+            for page in range(2, total_pages + 1):
+                while next_page <= total_pages and next_page < page + window:
+                    tasks[next_page] = asyncio.create_task(self.get_page(endpoint, params, next_page))
+                    next_page += 1
+                try:
+                    response = await tasks.pop(page)
+                except UpstreamError as e:
+                    # Skip the page rather than abort the whole export
+                    print(f"{endpoint}: skipping page {page}: {str(e)}")
+                    failed_pages.append(page)
+                    continue
+                yield response.json()
+        finally:
+            for task in tasks.values():
+                task.cancel()
         
-    async def json_categories(self):
-        categories = []
+        if failed_pages:
+            print(f"{endpoint}: {len(failed_pages)} pages failed: {failed_pages}")
+    
+    async def iter_modified_pages(self, endpoint: str, params: dict | None = None, modified_after: str | None = None, per_page: int = 100):
+        """Yield the records of `endpoint` modified after `modified_after` (GMT), oldest first, one page at a time.
+
+        Pages are keyed on date_modified_gmt rather than offsets: each request asks for records
+        modified after the last one seen, so a record modified mid-run moves behind the cursor
+        instead of shifting the others across a page boundary. modified_after only has second
+        precision, so the cursor's second is re-read and records already yielded are dropped.
+        Pages are fetched one after the other and any failure raises UpstreamError.
+        """
+        params = {**(params or {}), "orderby": "modified", "order": "asc", "dates_are_gmt": "true", "per_page": per_page}
+        after = modified_after
+        cursor = None
+        seen = set()  # ids yielded with date_modified_gmt == cursor
         page = 1
-        per_page = 20
-        
         while True:
-            response = self.wcapi.get(
-                "products/categories",
-                params={
-                    "per_page": per_page,
-                    "page": page
-                }
-            )
-            
-            if response.status_code == 200:
-                current_categories = response.json()
-                if not current_categories:  # If no more categories are returned
-                    break
-                    
-                categories.extend(current_categories)
+            page_params = {**params, "modified_after": after} if after else params
+            records = (await self.get_page(endpoint, page_params, page)).json()
+            fresh = [record for record in records if record["id"] not in seen]
+            if fresh:
+                yield fresh
+            if len(records) < per_page:
+                return
+            
+            last = records[-1]["date_modified_gmt"]
+            if last == cursor:
+                # A whole page modified within one second: step through that second by offset
                 page += 1
             else:
-                await asyncio.sleep(1)
+                cursor = last
+                after = (datetime.fromisoformat(cursor) - timedelta(seconds=1)).isoformat(timespec="seconds")
+                page = 1
+                seen = set()
+            seen.update(record["id"] for record in records if record["date_modified_gmt"] == cursor)
+    
+    async def save_pages(self, endpoint: str, params: dict, name: str):
+        """Stream every record of every page into the snapshot `name`. Returns the record count."""
+        with SnapshotWriter(name) as snapshot:
+            async for records in self.iter_pages(endpoint, params):
+                snapshot.write_many(records)
+        print(f"Saved {snapshot.count} records to {snapshot.path}")
+        return snapshot.count
+    
+    async def store_pages(self, endpoint: str, params: dict, table: str, extra: dict | None = None):
+        """Upsert every record of every page into the catalog `table`. Returns the record count."""
+        stored = 0
+        async for records in self.iter_pages(endpoint, params):
+            if not records:
                 continue
+            if extra:
+                records = [{**record, **extra} for record in records]
+            stored += await asyncio.to_thread(catalog.upsert, table, records)
+        print(f"Stored {stored} records from {endpoint} in {table}")
+        return stored
+        
+    async def json_categories(self):
+        categories = []
+        async for current_categories in self.iter_pages("products/categories"):
+            categories.extend(current_categories)
         
         filename = "categories/categories.json"
         with open(filename, 'w', encoding='utf-8') as f:
@@ -103,28 +201,8 @@ class WcmAgent:
     
     async def json_brands(self):
         brands = []
-        page = 1
-        per_page = 20
-        
-        while True:
-            response = self.wcapi.get(
-                "products/brands",
-                params={
-                    "per_page": per_page,
-                    "page": page
-                }
-            )
-            
-            if response.status_code == 200:
-                current_brands = response.json()
-                if not current_brands:  # If no more brands are returned
-                    break
-                    
-                brands.extend(current_brands)
-                page += 1
-            else:
-                await asyncio.sleep(1)
-                continue
+        async for current_brands in self.iter_pages("products/brands"):
+            brands.extend(current_brands)
         
         filename = "brands/brands.json"
         with open(filename, 'w', encoding='utf-8') as f:
@@ -133,141 +211,35 @@ class WcmAgent:
         return f"Brands saved to {filename}"
     
     async def json_customers(self):
-        page = 1
-        per_page = 20
-        customers = []
-        current_file_number = 1
-        customers_per_file = 100
-        
-        while True:
-            response = self.wcapi.get(
-                "customers",
-                params={
-                    "per_page": per_page,
-                    "page": page
-                }
-            )
-            
-            if response.status_code == 200:
-                current_customers = response.json()
-                if not current_customers:  # If no more customers are returned
-                    break
-                
-                customers.extend(current_customers)
-                
-                # Write to file every 100 customers
-                while len(customers) >= customers_per_file:
-                    filename = f"customers/customers_{current_file_number}.json"
-                    batch = customers[:customers_per_file]
-                    customers = customers[customers_per_file:]
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(batch, f, indent=4, ensure_ascii=False)
-                    
-                    print(f"Saved {filename}")
-                    current_file_number += 1
-                
-                page += 1
-            else:
-                await asyncio.sleep(1)
-                continue
-        
-        # Write any remaining customers
-        if customers:
-            filename = f"customers/customers_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(customers, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
+        stored = await self.store_pages("customers", {}, "woo_customers")
             
-        return f"Customers saved to customers_1.json through customers_{current_file_number}.json"
+        return f"{stored} customers saved to the catalog"
     
     def filter_customers(self):
-        real_customers = []
-        count = 1
-        while True:
-            
-            if not os.path.exists(f"customers/customers_{count}.json"):
-                break
-            
-            with open(f"customers/customers_{count}.json", "r") as f:
-                customers = json.load(f)
-            
-            for customer in customers:
-                if customer["first_name"] != "" or customer["last_name"] != "":
-                    real_customers.append(customer)
-                
-            count += 1
-                
-        with open("customers/real_customers.json", "w", encoding="utf-8") as f:
-            json.dump(real_customers, f, indent=4, ensure_ascii=False)
+        real_customers = (
+            customer for customer in catalog.scan("woo_customers")
+            if customer["first_name"] != "" or customer["last_name"] != ""
+        )
+        count = write_snapshot("customers/real_customers", real_customers)
                 
-        return f"Real customers saved to customers/real_customers.json"
+        return f"{count} real customers saved to {snapshot_path('customers/real_customers')}"
     
     async def json_products(self):
-        products = []
-        page = 1
-        per_page = 20
-        current_file_number = 1
-        products_per_file = 100
-        
-        while True:
-            response = self.wcapi.get(
-                "products",
-                params={
-                    "per_page": per_page,
-                    "page": page,
-                    "status": "publish",
-                    "type": "simple",
-                    "search": "Produkt"
-                }
-            )
-            
-            if response.status_code == 200:
-                current_products = response.json()
-                if not current_products:
-                    break
-                
-                products.extend(current_products)
-                
-                while len(products) >= products_per_file:
-                    filename = f"wcm_products/wcm_products_{current_file_number}.json"
-                    batch = products[:products_per_file]
-                    products = products[products_per_file:]
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(batch, f, indent=4, ensure_ascii=False)
-                    
-                    print(f"Saved {filename}")
-                    current_file_number += 1
-                
-                page += 1
-            else:
-                await asyncio.sleep(1)
-                continue
-        
-        # Write any remaining products
-        if products:
-            filename = f"wcm_products/wcm_products_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(products, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
+        stored = await self.store_pages(
+            "products",
+            {
+                "status": "publish",
+                "type": "simple",
+                "search": "Produkt"
+            },
+            "woo_products"
+        )
             
-        return f"Products saved to wcm_products_1.json through wcm_products_{current_file_number}.json"
+        return f"{stored} products saved to the catalog"
     
     async def clean_products(self):
-        cleaned_products = []
-        count = 1
-        current_file_number = 1
-        products_per_file = 100
-        
-        while True:
-            if not os.path.exists(f"wcm_products/wcm_products_{count}.json"):
-                break
-            
-            with open(f"wcm_products/wcm_products_{count}.json", "r") as f:
-                products = json.load(f)
-            
-            for product in products:
+        with SnapshotWriter("products/cleaned_products") as snapshot:
+            for product in catalog.scan("woo_products", where={"type": "simple"}):
                 if product['sku'] == "":
                     continue
                 # Remove unwanted fields
@@ -275,383 +247,147 @@ class WcmAgent:
                 product.pop('yoast_head', None)
                 product.pop('price_html', None)
                 product.pop('yoast_head_json', None)
-                cleaned_products.append(product)
-                
-                # Write to file every 100 products
-                while len(cleaned_products) >= products_per_file:
-                    filename = f"wcm_products/cleaned_products_{current_file_number}.json"
-                    batch = cleaned_products[:products_per_file]
-                    cleaned_products = cleaned_products[products_per_file:]
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(batch, f, indent=4, ensure_ascii=False)
-                    
-                    print(f"Saved {filename}")
-                    current_file_number += 1
-            
-            count += 1
+                snapshot.write(product)
         
-        # Write any remaining products
-        if cleaned_products:
-            filename = f"wcm_products/cleaned_products_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_products, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
-        
-        return f"Products cleaned and saved to cleaned_products_1.json through cleaned_products_{current_file_number}.json"
+        return f"{snapshot.count} products cleaned and saved to {snapshot.path}"
     
     async def delete_products_files(self):
-        count = 1
-        while True:
-            if not os.path.exists(f"wcm_products/cleaned_products_{count}.json"):
-                break
-            
-            os.remove(f"wcm_products/cleaned_products_{count}.json")
-            count += 1
+        delete_snapshot("products/cleaned_products")
     
     async def check_duplicates(self):
-        all_products = []
-        new_products = []
         seen_skus = set()
         
-        # Read all products from JSON files
-        count = 1
-        while True:
-            file_path = f"products/cleaned_products_{count}.json"
-            if not os.path.exists(file_path):
-                break
-            
-            with open(file_path, "r") as f:
-                products = json.load(f)
-                all_products.extend(products)
-            count += 1
-        
-        # Check for duplicates and unique products
-        print(f"Found {len(all_products)} products")
-        for product in all_products:
-            if not product["sku"] in seen_skus:
-                seen_skus.add(product["sku"])
-                new_products.append(product)
-        
-        def make_chunks(products, chunk_size):
-            for i in range(0, len(products), chunk_size):
-                yield products[i:i + chunk_size]
+        def unique_products():
+            # Only the SKUs are held in memory; products stream from one snapshot to the next
+            for product in read_snapshot("products/cleaned_products"):
+                if not product["sku"] in seen_skus:
+                    seen_skus.add(product["sku"])
+                    yield product
         
-        chunks = list(make_chunks(new_products, 100))
+        count = write_snapshot("products/new_products", unique_products())
+        print(f"Found {count} unique products")
         
-        for index, chunk in enumerate(chunks):
-            with open(f"products/new_products_{index}.json", "w", encoding="utf-8") as f:
-                json.dump(chunk, f, indent=4, ensure_ascii=False)
-            print(f"Saved chunk {index}")
-        
-        return f"New products saved to new_products_0.json through new_products_{len(chunks) - 1}.json"
+        return f"New products saved to {snapshot_path('products/new_products')}"
 
     async def check_duplicates_names(self):
-        all_products = []
-        new_products = []
         seen_names = set()
         
-        count = 0
+        def renamed_products():
+            for product in read_snapshot("products/new_products"):
+                base_name = product["name"]
+                counter = 2
+                while product["name"] in seen_names:
+                    product["name"] = f"{base_name} ({counter})"
+                    counter += 1
+                seen_names.add(product["name"])
+                yield product
         
-        while True:
-            file_path = f"products/new_products_{count}.json"
-            if not os.path.exists(file_path):
-                break
-            
-            with open(file_path, "r") as f:
-                products = json.load(f)
-                all_products.extend(products)
-            count += 1
-        
-        print(f"Found {len(all_products)} products")
-        for product in all_products:
-            base_name = product["name"]
-            counter = 2
-            while product["name"] in seen_names:
-                product["name"] = f"{base_name} ({counter})"
-                counter += 1
-            seen_names.add(product["name"])
-            new_products.append(product)
-        
-        # Save updated products in chunks of 100
-        def make_chunks(products, chunk_size):
-            for i in range(0, len(products), chunk_size):
-                yield products[i:i + chunk_size]
-        
-        chunks = list(make_chunks(new_products, 100))
+        count = write_snapshot("products/renamed_products", renamed_products())
+        print(f"Found {count} products")
         
-        for index, chunk in enumerate(chunks):
-            filename = f"products/renamed_products_{index}.json"
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(chunk, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
-        
-        return f"Renamed products saved to renamed_products_0.json through renamed_products_{len(chunks) - 1}.json"
+        return f"Renamed products saved to {snapshot_path('products/renamed_products')}"
     
     async def check_duplicates_total(self):
         count = 0
-        seen_names = []
+        seen_names = set()
         duplicates = 0
-        while True:
-            file_path = f"products/products_{count}.json"
-            if not os.path.exists(file_path):
-                break
-            
-            with open(file_path, "r") as f:
-                products = json.load(f)
-            
-            for product in products:
-                if product["name"] in seen_names:
-                    print(f"Duplicate name found: {product['name']}")
-                    duplicates += 1
-                else:
-                    seen_names.append(product["name"])
+        for product in read_snapshot("products/renamed_products"):
+            if product["name"] in seen_names:
+                print(f"Duplicate name found: {product['name']}")
+                duplicates += 1
+            else:
+                seen_names.add(product["name"])
             count += 1
             
-        print(f"Checked {count} files, found {duplicates} duplicates")
+        print(f"Checked {count} products, found {duplicates} duplicates")
     
     async def get_variable_products(self):
-        products = []
-        page = 1
-        per_page = 20
-        current_file_number = 1
-        products_per_file = 100
-        
-        while True:
-            response = self.wcapi.get(
-                "products",
-                params={
-                    "per_page": per_page,
-                    "page": page,
-                    "status": "publish",
-                    "type": "variable"
-                }
-            )
-            
-            if response.status_code == 200:
-                current_products = response.json()
-                if not current_products:
-                    break
-                
-                products.extend(current_products)
-                
-                while len(products) >= products_per_file:
-                    filename = f"variable_products/variable_products_{current_file_number}.json"
-                    batch = products[:products_per_file]
-                    products = products[products_per_file:]
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(batch, f, indent=4, ensure_ascii=False)
-                    
-                    print(f"Saved {filename}")
-                    current_file_number += 1
-                
-                page += 1
-            else:
-                await asyncio.sleep(1)
-                continue
-        
-        # Write any remaining products
-        if products:
-            filename = f"variable_products/variable_products_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(products, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
+        stored = await self.store_pages(
+            "products",
+            {
+                "status": "publish",
+                "type": "variable"
+            },
+            "woo_products"
+        )
             
-        print(f"Products saved to products_1.json through products_{current_file_number}.json")
+        print(f"{stored} variable products saved to the catalog")
     
     async def get_attributes(self):
-        attributes = []
-        page = 1
-        per_page = 20
-        current_file_number = 1
-        attributes_per_file = 100
-        
-        while True:
-            response = self.wcapi.get(
-                "products/attributes",
-                params={
-                    "per_page": per_page,
-                    "page": page
-                }
-            )
+        count = await self.save_pages("products/attributes", {}, "attributes/attributes")
             
-            if response.status_code == 200:
-                current_attributes = response.json()
-                if not current_attributes:
-                    break
-                    
-                attributes.extend(current_attributes)
-                
-                while len(attributes) >= attributes_per_file:
-                    filename = f"attributes/attributes_{current_file_number}.json"
-                    batch = attributes[:attributes_per_file]
-                    attributes = attributes[attributes_per_file:]
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(batch, f, indent=4, ensure_ascii=False)
-                    
-                    print(f"Saved {filename}")
-                    current_file_number += 1
-                
-                page += 1
-            else:
-                await asyncio.sleep(1)
-                continue
-                    
-        if attributes:
-            filename = f"attributes/attributes_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(attributes, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
-            
-        return f"Attributes saved to attributes_1.json through attributes_{current_file_number}.json"
+        return f"{count} attributes saved to {snapshot_path('attributes/attributes')}"
     
     async def get_product_variations(self):
         print("Getting product variations")
-        count = 1
-
-        # Ensure variations directory exists
-        os.makedirs("variations", exist_ok=True)
+        stored = 0
         
-        while True:
-            print(f"Getting variations for product {count}")
-            file_path = f"variable_products/products_{count}.json"
-            if not os.path.exists(file_path):
-                print(f"File {file_path} does not exist")
-                break
-            
-            print(f"File {file_path} exists")
-            with open(file_path, "r") as f:
-                products = json.load(f)
-            
-            for product in products:
-                try:
-                    response = self.wcapi.get(
-                        f"products/{product['id']}/variations"
-                    )
-                    # Add delay to avoid rate limiting
-                    await asyncio.sleep(0.5)  # 500ms delay between requests
-                    
-                    response.raise_for_status()  # Raise exception for bad status codes
-                    variations = response.json()
-                    
-                    filename = f"variations/variations_{product['id']}.json"
-                    with open(filename, "w", encoding="utf-8") as f:
-                        json.dump(variations, f, indent=4, ensure_ascii=False)
-                    print(f"Saved variations for product {product['id']}")
-                
-                except Exception as e:
-                    print(f"Error processing product {product['id']}: {str(e)}")
-                    
-            count += 1
+        for product in catalog.scan("woo_products", where={"type": "variable"}):
+            try:
+                # Variations don't carry their parent, so record it for lookups by product
+                stored += await self.store_pages(
+                    f"products/{product['id']}/variations",
+                    {},
+                    "woo_variations",
+                    extra={"parent_id": product["id"]}
+                )
+            except Exception as e:
+                print(f"Error processing product {product['id']}: {str(e)}")
+        
+        print(f"Saved {stored} variations to the catalog")
 
     async def separate_wrong_products(self):
-        count = 1
-        wrong_products = []
-        current_file_number = 1
-        products_per_file = 100
-        
-        while True:
-            file_path = f"wcm_products/wcm_products_{count}.json"
-            if not os.path.exists(file_path):
-                break
-            
-            with open(file_path, "r") as f:
-                products = json.load(f)
+        with SnapshotWriter("wrong_products/wrong_products") as snapshot:
+            for product in catalog.scan("woo_products", where={"name": "Produkt"}):
+                print(f"Product {product['id']} is a wrong product")
+                snapshot.write(product)
             
-            for product in products:
-                if product["name"] == "Produkt":
-                    print(f"Product {product['id']} is a wrong product")
-                    wrong_products.append(product)
-                    
-                    # Write to file every 100 products
-                    while len(wrong_products) >= products_per_file:
-                        filename = f"wrong_products/wrong_products_{current_file_number}.json"
-                        batch = wrong_products[:products_per_file]
-                        wrong_products = wrong_products[products_per_file:]
-                        
-                        with open(filename, 'w', encoding='utf-8') as f:
-                            json.dump(batch, f, indent=4, ensure_ascii=False)
-                        
-                        print(f"Saved {filename}")
-                        current_file_number += 1
-            
-            count += 1
-        
-        # Write any remaining products
-        if wrong_products:
-            filename = f"wrong_products/wrong_products_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(wrong_products, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
-            
-        return f"Wrong products saved to wrong_products_1.json through wrong_products_{current_file_number}.json"
+        return f"{snapshot.count} wrong products saved to {snapshot.path}"
     
     async def delete_wrong_products(self):
         try:
-            print(self.wcapi.delete("products/118506", params={"force": True}).json())
+            print((await self.request("delete", "products/118506", params={"force": True})).json())
         except Exception as e:
             print(e)
         return
     
-        count = 1
         deleted_count = 0
         error_count = 0
-        executor = ThreadPoolExecutor()
 
-        while True:
-            file_path = f"wrong_products/wrong_products_{count}.json"
-            if not os.path.exists(file_path):
-                break
+        for product in read_snapshot("wrong_products/wrong_products"):
+            if product["name"] == "Produkt":
+                max_retries = 3
+                retry_count = 0
 
-            try:
-                with open(file_path, "r") as f:
-                    products = json.load(f)
+                while retry_count < max_retries:
+                    try:
+                        print(f"Deleting product {product['id']} (attempt {retry_count + 1})")
 
-                for product in products:
-                    if product["name"] == "Produkt":
-                        max_retries = 3
-                        retry_count = 0
+                        result = await self.request("delete", f"products/{product['id']}", params={"force": True})
 
-                        while retry_count < max_retries:
-                            try:
-                                print(f"Deleting product {product['id']} (attempt {retry_count + 1})")
+                        print(f"Response Status: {result.status_code}")
+                        print(f"Response Headers: {result.headers}")
+                        print(f"Response Text: {result.text}")
 
-                                # Run blocking `wcapi.delete(...)` in a separate thread
-                                loop = asyncio.get_running_loop()
-                                result = await loop.run_in_executor(
-                                    executor, lambda: self.wcapi.delete(f"products/{product['id']}", params={"force": True})
-                                )
-                                
-                                print(f"Response Status: {result.status_code}")
-                                print(f"Response Headers: {result.headers}")
-                                print(f"Response Text: {result.text}")
+                        if result.status_code == 200:
+                            deleted_count += 1
+                            print(f"Successfully deleted product {product['id']}")
+                            await asyncio.sleep(2)  # Short delay after successful deletion
+                            break
+                        else:
+                            print(f"Failed to delete product {product['id']}: Status {result.status_code}")
+                            await asyncio.sleep(5)  # Longer delay on failure
+                            retry_count += 1
 
-                                if result.status_code == 200:
-                                    deleted_count += 1
-                                    print(f"Successfully deleted product {product['id']}")
-                                    await asyncio.sleep(2)  # Short delay after successful deletion
-                                    break
-                                else:
-                                    print(f"Failed to delete product {product['id']}: Status {result.status_code}")
-                                    await asyncio.sleep(5)  # Longer delay on failure
-                                    retry_count += 1
+                    except Exception as e:
+                        print(f"Error deleting product {product['id']}: {str(e)}")
+                        await asyncio.sleep(10)  # Longer delay on connection error
+                        retry_count += 1
+                        continue
 
-                            except Exception as e:
-                                print(f"Error deleting product {product['id']}: {str(e)}")
-                                await asyncio.sleep(10)  # Longer delay on connection error
-                                retry_count += 1
-                                continue
-
-                        if retry_count == max_retries:
-                            error_count += 1
-                            print(f"Failed to delete product {product['id']} after {max_retries} attempts")
-
-            except Exception as e:
-                print(f"Error reading file {file_path}: {str(e)}")
-
-            count += 1
+                if retry_count == max_retries:
+                    error_count += 1
+                    print(f"Failed to delete product {product['id']} after {max_retries} attempts")
 
         return f"Process completed. Successfully deleted {deleted_count} products. Encountered {error_count} errors."
 
@@ -663,7 +399,7 @@ class WcmAgent:
             }
         }
 
-        print(self.wcapi.post("products/categories", data).json())
+        print((await self.request("post", "products/categories", data)).json())
         
     async def delete_cat_test(self):
         max_retries = 5  # Increased retries
@@ -675,7 +411,8 @@ class WcmAgent:
                 await asyncio.sleep(2 ** retry_count)  # 1, 2, 4, 8, 16 seconds
                 
                 print(f"Attempt {retry_count + 1}: Trying to delete category 5248")
-                response = self.wcapi.delete(
+                response = await self.request(
+                    "delete",
                     "products/categories/5248",
                     params={
                         "force": True,
@@ -701,51 +438,18 @@ class WcmAgent:
         return
     
     async def get_orders(self):
-        orders = []
-        page = 1
-        per_page = 20
-        current_file_number = 1
-        orders_per_file = 100
-        
-        while True:
-            response = self.wcapi.get(
-                "orders",
-                params={
-                    "per_page": per_page,
-                    "page": page,
-                    "status": "completed"
-                }
-            )
-            
-            if response.status_code == 200:
-                current_orders = response.json()
-                if not current_orders:  # If no more orders are returned
-                    break
-                
-                orders.extend(current_orders)
-                
-                # Write to file every 100 orders
-                while len(orders) >= orders_per_file:
-                    filename = f"orders/orders_{current_file_number}.json"
-                    batch = orders[:orders_per_file]
-                    orders = orders[orders_per_file:]
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(batch, f, indent=4, ensure_ascii=False)
-                    
-                    print(f"Saved {filename}")
-                    current_file_number += 1
-                
-                page += 1
-            else:
-                await asyncio.sleep(1)
-                continue
-        
-        # Write any remaining orders
-        if orders:
-            filename = f"orders/orders_{current_file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(orders, f, indent=4, ensure_ascii=False)
-            print(f"Saved {filename}")
+        stored = await self.store_pages("orders", {"status": "completed"}, "woo_orders")
             
-        return f"Orders saved to orders_1.json through orders_{current_file_number}.json"
+        return f"{stored} orders saved to the catalog"
+    
+    async def get_orders_modified_after(self, modified_after: str | None):
+        """Fetch completed orders modified after `modified_after` (GMT) into the catalog; returns them oldest first.
+
+        Raises UpstreamError if any page fails, so a gap in the delta can never be mistaken for the end of it.
+        """
+        # Keyed by id: an order modified during the fetch is read twice, and the later copy wins
+        orders = {}
+        async for records in self.iter_modified_pages("orders", {"status": "completed"}, modified_after):
+            await asyncio.to_thread(catalog.upsert, "woo_orders", records)
+            orders.update((record["id"], record) for record in records)
+        return sorted(orders.values(), key=lambda order: order["date_modified_gmt"])
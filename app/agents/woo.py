@@ -0,0 +1,21 @@
+import httpx
+
+from app.agents.http import get_wcm_client
+
+class WooClient:
+    """Async WooCommerce REST (wc/v3) client sharing the pooled WooCommerce connection.
+
+    Mirrors the woocommerce.API call signatures, e.g. `get("products", params={...})`,
+    `post("products/categories", data)` or `get(f"products/{id}/variations")`.
+    """
+    async def get(self, endpoint: str, params: dict | None = None) -> httpx.Response:
+        return await get_wcm_client().get(endpoint, params=params)
+
+    async def post(self, endpoint: str, data: dict, params: dict | None = None) -> httpx.Response:
+        return await get_wcm_client().post(endpoint, json=data, params=params)
+
+    async def put(self, endpoint: str, data: dict, params: dict | None = None) -> httpx.Response:
+        return await get_wcm_client().put(endpoint, json=data, params=params)
+
+    async def delete(self, endpoint: str, params: dict | None = None) -> httpx.Response:
+        return await get_wcm_client().delete(endpoint, params=params)
@@ -1,16 +1,54 @@
-import httpx, json, requests, io
+import asyncio, httpx, json, io
 from datetime import datetime, timedelta
-import http.client
 from PIL import Image  # Add this import at the top of the file
-from urllib.parse import urlencode  # Add this import at the top of the file
 
 from app.config import settings
-from app.agents.postgres import PostgresAgent
+from app.agents.concurrency import AdaptiveLimiter
+from app.agents.http import get_zoho_client
+from app.agents.ratelimit import RateLimiter, retry_after_seconds
+from app.agents.postgres import PostgresAgent, content_hash
 from app.models.category import CategoryBase
+from app.models.item import ItemMappingBase
 from app.schemas.customer import Customer
+from app.store.catalog import catalog
+from app.store.sku_index import sku_index
 from app.schemas.item import Item
 from app.schemas.item_group import ItemGroup
 from app.schemas.order import Order
+
+class TokenCache:
+    """Process-wide Zoho OAuth token, shared by every ZohoAgent instance."""
+    def __init__(self):
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = None
+        self.loaded = False
+        # Held while loading from Postgres or refreshing, so only one refresh runs at a time
+        self.lock = asyncio.Lock()
+    
+    def set(self, access_token: str, refresh_token: str, expires_at: datetime):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.loaded = True
+    
+    def is_fresh(self):
+        if not self.access_token or not self.expires_at:
+            return False
+        return self.expires_at - timedelta(seconds=settings.ZOHO_TOKEN_EXPIRY_MARGIN) > datetime.now()
+
+token_cache = TokenCache()
+
+# Every Zoho API call is scheduled through this limiter
+rate_limiter = RateLimiter(settings.ZOHO_RATE_LIMIT_PER_MINUTE, settings.ZOHO_RATE_LIMIT_PER_DAY)
+concurrency = AdaptiveLimiter(
+    "zoho",
+    settings.ZOHO_CONCURRENCY_INITIAL,
+    settings.ZOHO_CONCURRENCY_MIN,
+    settings.ZOHO_CONCURRENCY_MAX,
+    settings.ZOHO_LATENCY_TARGET,
+)
+
 class ZohoAgent:
     def __init__(self):
         self.access_token = None
@@ -19,24 +57,19 @@ class ZohoAgent:
         self.client_secret = settings.ZOHO_CLIENT_SECRET
         self.redirect_uri = settings.ZOHO_REDIRECT_URI
         self.postgres_agent = PostgresAgent()
-        
-    async def get_access_token(self):
-        if not self.access_token or not self.refresh_token:
-            return {"error": "No access token or refresh token available"}
     
     async def get_access_and_refresh_token(self, code: str):
-        async with httpx.AsyncClient() as client:
-            print(settings.ZOHO_CLIENT_ID)
-            response = await client.post(
-                "https://accounts.zoho.eu/oauth/v2/token",
-                data={
-                    "code": code,
-                    "client_id": settings.ZOHO_CLIENT_ID,
-                    "client_secret": settings.ZOHO_CLIENT_SECRET,
-                    "redirect_uri": settings.ZOHO_REDIRECT_URI,
-                    "grant_type": "authorization_code"
-                }
-            )
+        print(settings.ZOHO_CLIENT_ID)
+        response = await get_zoho_client().post(
+            settings.ZOHO_TOKEN_URL,
+            data={
+                "code": code,
+                "client_id": settings.ZOHO_CLIENT_ID,
+                "client_secret": settings.ZOHO_CLIENT_SECRET,
+                "redirect_uri": settings.ZOHO_REDIRECT_URI,
+                "grant_type": "authorization_code"
+            }
+        )
         
         response_data = response.json()
         
@@ -53,27 +86,28 @@ class ZohoAgent:
             return {"error": str(e)}
         
         await self.postgres_agent.insert_oauth(self.access_token, self.refresh_token, self.expires_at)
+        token_cache.set(self.access_token, self.refresh_token, self.expires_at)
 
         return {"access_token": self.access_token, "refresh_token": self.refresh_token, "expires_at": self.expires_at}
     
     async def get_access_token_from_refresh_token(self, refresh_token: str):
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://accounts.zoho.eu/oauth/v2/token",
-                data={
-                    "refresh_token": refresh_token,
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "redirect_uri": self.redirect_uri,
-                    "grant_type": "refresh_token"
-                }
-            )
+        response = await get_zoho_client().post(
+            settings.ZOHO_TOKEN_URL,
+            data={
+                "refresh_token": refresh_token,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "redirect_uri": self.redirect_uri,
+                "grant_type": "refresh_token"
+            }
+        )
         
         response_data = response.json()
         
         print(response_data)
         
-        if response.status_code != 200:
+        # Zoho reports some failures (e.g. invalid_code) with a 200 status
+        if response.status_code != 200 or "access_token" not in response_data:
             return {"error": response_data}
         
         self.access_token = response_data["access_token"]
@@ -84,90 +118,162 @@ class ZohoAgent:
         if not result:
             return {"error": "Failed to update OAuth token"}
         
+        token_cache.set(self.access_token, refresh_token, self.expires_at)
+        
         return result
     
-    async def get_access_token(self):
+    async def load_access_token(self):
+        """Seed the token cache from Postgres. Caller must hold token_cache.lock."""
         oauth_token = await self.postgres_agent.get_oauth()
+        if oauth_token:
+            token_cache.set(oauth_token.access_token, oauth_token.refresh_token, oauth_token.expires_at)
+        return oauth_token
+    
+    async def get_access_token(self):
+        if token_cache.is_fresh():
+            return token_cache.access_token
+        
+        async with token_cache.lock:
+            # Another coroutine may have refreshed the token while we waited for the lock
+            if not token_cache.loaded:
+                if not await self.load_access_token():
+                    return {"error": "No OAuth token available"}
+            
+            if not token_cache.is_fresh():
+                new_oauth_token = await self.get_access_token_from_refresh_token(token_cache.refresh_token)
+                if isinstance(new_oauth_token, dict) and "error" in new_oauth_token:
+                    return {"error": new_oauth_token["error"]}
+            
+            return token_cache.access_token
+    
+    async def keep_access_token_fresh(self):
+        """Background task: renew the token ZOHO_TOKEN_REFRESH_MARGIN seconds before it expires.
+
+        Failed refreshes are retried with exponential backoff, starting at ZOHO_TOKEN_CHECK_INTERVAL
+        and capped at ZOHO_TOKEN_RETRY_MAX_DELAY, since Zoho strictly limits its token endpoint.
+        """
+        failures = 0
+        while True:
+            delay = settings.ZOHO_TOKEN_CHECK_INTERVAL
+            failed = False
+            try:
+                async with token_cache.lock:
+                    if not token_cache.loaded:
+                        await self.load_access_token()
+                    
+                    if token_cache.loaded:
+                        refresh_at = token_cache.expires_at - timedelta(seconds=settings.ZOHO_TOKEN_REFRESH_MARGIN)
+                        if refresh_at <= datetime.now():
+                            result = await self.get_access_token_from_refresh_token(token_cache.refresh_token)
+                            if isinstance(result, dict) and "error" in result:
+                                print(f"Background token refresh failed: {result['error']}")
+                                failed = True
+                            else:
+                                print(f"Zoho token refreshed, expires at {token_cache.expires_at}")
+                                refresh_at = token_cache.expires_at - timedelta(seconds=settings.ZOHO_TOKEN_REFRESH_MARGIN)
+                        
+                        if not failed:
+                            delay = min(delay, max(1.0, (refresh_at - datetime.now()).total_seconds()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Background token refresh error: {str(e)}")
+                failed = True
+            
+            if failed:
+                failures += 1
+                delay = min(settings.ZOHO_TOKEN_CHECK_INTERVAL * 2 ** (failures - 1), settings.ZOHO_TOKEN_RETRY_MAX_DELAY)
+                print(f"Retrying token refresh in {delay:.0f}s")
+            else:
+                failures = 0
+            
+            await asyncio.sleep(delay)
+    
+    async def request(self, method: str, path: str, params: dict | None = None, headers: dict | None = None, **kwargs) -> httpx.Response:
+        params = { 'organization_id': settings.ZOHO_ORGANIZATION_ID, **(params or {}) }
         
-        if not oauth_token:
-            return {"error": "No OAuth token available"}
-        
-        if oauth_token.expires_at < datetime.now():
-            new_oauth_token = await self.get_access_token_from_refresh_token(oauth_token.refresh_token)
-            if "error" in new_oauth_token:
-                return {"error": new_oauth_token["error"]}
-            oauth_token = new_oauth_token
+        while True:
+            await rate_limiter.acquire()
+            access_token = await self.get_access_token()
+            request_headers = { 'Authorization': f"Zoho-oauthtoken {access_token}", **(headers or {}) }
             
-        return oauth_token.access_token
+            res = await concurrency.call(
+                lambda: get_zoho_client().request(method, f"/inventory/v1{path}", params=params, headers=request_headers, **kwargs)
+            )
+            if res.status_code != 429:
+                return res
+            
+            # Pause every caller until the limit has passed, then retry this call
+            delay = retry_after_seconds(res.headers.get("Retry-After"), settings.ZOHO_RATE_LIMIT_BACKOFF)
+            print(f"Zoho rate limit hit on {method} {path}, pausing for {delay:.0f}s")
+            rate_limiter.pause(delay)
+    
+    async def get_page(self, path: str, page: int, per_page: int = 200, params: dict | None = None):
+        res = await self.request("GET", path, params={**(params or {}), "page": page, "per_page": per_page})
+        return res.json()
+    
+    async def paginate(self, path: str, key: str, params: dict | None = None, per_page: int = 200):
+        """Yield every record of a Zoho list endpoint, prefetching the next page while the caller works."""
+        page = 1
+        fetch = asyncio.create_task(self.get_page(path, page, per_page, params))
+        try:
+            while fetch is not None:
+                json_data = await fetch
+                fetch = None
+                
+                if json_data.get("code", 0) != 0:
+                    print(f"Zoho error on {path} page {page}: {json_data.get('message')}")
+                
+                if json_data.get("page_context", {}).get("has_more_page", False):
+                    page += 1
+                    fetch = asyncio.create_task(self.get_page(path, page, per_page, params))
+                
+                for record in json_data.get(key) or []:
+                    yield record
+        finally:
+            if fetch is not None:
+                fetch.cancel()
+    
+    def iter_categories(self):
+        return self.paginate("/categories", "categories")
+    
+    def iter_brands(self):
+        return self.paginate("/brands", "brands")
+    
+    def iter_customers(self, params: dict | None = None):
+        return self.paginate("/contacts", "contacts", params)
+    
+    def iter_item_groups(self):
+        return self.paginate("/itemgroups", "itemgroups")
+    
+    def iter_orders(self, params: dict | None = None):
+        return self.paginate("/salesorders", "salesorders", params)
     
     async def get_categories(self):
-        access_token = await self.get_access_token()
-            
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-
-        conn.request("GET", f"/inventory/v1/categories?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        """Every category across all pages, in Zoho's response shape."""
+        return {"categories": [record async for record in self.iter_categories()]}
     
     async def create_category(self, category: CategoryBase):
-        access_token = await self.get_access_token()
-            
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        payload = json.dumps({
+        payload = {
             "name": category.name,
             "url": category.url,
             "parent_category_id": category.zoho_parent_id
-        })
-
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-
-        conn.request("POST", f"/inventory/v1/categories?organization_id={settings.ZOHO_ORGANIZATION_ID}", payload, headers)
-
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        }
+        
+        res = await self.request("POST", "/categories", json=payload)
+        return res.json()
         
     async def get_brands(self):
-        access_token = await self.get_access_token()
-            
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-
-        conn.request("GET", f"/inventory/v1/brands?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        """Every brand across all pages, in Zoho's response shape."""
+        return {"brands": [record async for record in self.iter_brands()]}
     
     async def get_customers(self):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("GET", f"/inventory/v1/contacts?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        """Every contact across all pages, in Zoho's response shape."""
+        return {"contacts": [record async for record in self.iter_customers()]}
     
     async def create_customer(self, customer: Customer):
         try:
-            access_token = await self.get_access_token()
-            
-            conn = http.client.HTTPSConnection("www.zohoapis.eu")
-            payload = json.dumps({
+            payload = {
                 "contact_name": customer.contact_name,
                 "company_name": customer.company_name,
                 "contact_type": customer.contact_type,
@@ -191,95 +297,81 @@ class ZohoAgent:
                     "email": person.email,
                     "is_primary_contact": person.is_primary_contact
                 } for person in customer.contact_persons]
-            })
-            
-            headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-            
-            conn.request("POST", f"/inventory/v1/contacts?organization_id={settings.ZOHO_ORGANIZATION_ID}", payload, headers)
+            }
             
-            res = conn.getresponse()
-            data = res.read()
-            json_data = data.decode('utf-8')  # Convert bytes to string
-            return json.loads(json_data)
+            res = await self.request("POST", "/contacts", json=payload)
+            return res.json()
         
         except KeyError as e:
             print(f"Error: Missing required field in customer data: {e}")
             return {"error": str(e)}
     
     async def get_contact_persons(self):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("GET", f"/inventory/v1/contacts/686329000000279600/contactpersons?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        res = await self.request("GET", "/contacts/686329000000279600/contactpersons")
+        return res.json()
     
-    async def get_items(self):
-        page = 1
-        per_page = 100  # Items per page
-        file_number = 0
+    async def get_items(self, page_concurrency: int | None = None):
+        """Mirror every Zoho item into the catalog, fetching up to `page_concurrency` pages at once."""
+        page_concurrency = page_concurrency or settings.ZOHO_ITEMS_PAGE_CONCURRENCY
+        per_page = 200  # Zoho's maximum page size
+        pending = {}
+        next_page = 1
+        last_page = None
+        saved = 0
         
-        while True:
-            access_token = await self.get_access_token()
-            conn = http.client.HTTPSConnection("www.zohoapis.eu")
-            
-            headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-            
-            conn.request("GET", f"/inventory/v1/items?organization_id={settings.ZOHO_ORGANIZATION_ID}&page={page}&per_page={per_page}", headers=headers)
-            
-            res = conn.getresponse()
-            data = res.read()
-            json_data = json.loads(data.decode('utf-8'))
-            
-            # Check if we have items in the response
-            if 'items' not in json_data or not json_data['items']:
-                break
-                
-            # Save current batch to a JSON file
-            filename = f"zoho_items/items_{file_number}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(json_data['items'], f, indent=4, ensure_ascii=False)
+        try:
+            while True:
+                # Keep the window full until a page reports has_more_page == False
+                while len(pending) < page_concurrency and (last_page is None or next_page <= last_page):
+                    pending[asyncio.create_task(self.get_page("/items", next_page, per_page))] = next_page
+                    next_page += 1
                 
-            print(f"Saved batch {file_number} with {len(json_data['items'])} items to {filename}")
-            
-            # Check if we've reached the last page
-            if len(json_data['items']) < per_page:
-                break
+                if not pending:
+                    break
                 
-            page += 1
-            file_number += 1
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page = pending.pop(task)
+                    json_data = task.result()
+                    
+                    if json_data.get("code", 0) != 0:
+                        print(f"Zoho error on items page {page}: {json_data.get('message')}")
+                    
+                    if json_data.get("items"):
+                        saved += await asyncio.to_thread(catalog.upsert, "zoho_items", json_data["items"])
+                        print(f"Saved page {page} with {len(json_data['items'])} items")
+                    
+                    if not json_data.get("page_context", {}).get("has_more_page", False):
+                        last_page = page if last_page is None else min(last_page, page)
+        finally:
+            for task in pending:
+                task.cancel()
             
-        print(f"Successfully saved {file_number} batches of items")
+        print(f"Successfully saved {saved} items")
+        # Rebuild from the fresh mirror on next use
+        sku_index.invalidate()
     
-    async def create_item(self, item: Item):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
+    async def create_item(self, item: Item, woo_product_id: int | None = None):
+        payload = item.model_dump()
+        res = await self.request("POST", "/items", json=payload)
+        result = res.json()
+        
+        if result.get("item"):
+            await asyncio.to_thread(catalog.upsert, "zoho_items", [result["item"]])
+            sku_index.add(result["item"])
+        
+        if woo_product_id is not None and result.get("item"):
+            await self.postgres_agent.upsert_items([ItemMappingBase(
+                woo_product_id=woo_product_id,
+                sku=result["item"].get("sku") or item.sku,
+                zoho_item_id=result["item"]["item_id"],
+                content_hash=content_hash(payload)
+            )])
         
-        payload = json.dumps(item.model_dump())
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("POST", f"/inventory/v1/items?organization_id={settings.ZOHO_ORGANIZATION_ID}", payload, headers)
-        
-        res = conn.getresponse()
-        status_code = res.status
-        if status_code == 429:
-            return {"limit_exceeded": True}
-        else:
-            data = res.read()
-            json_data = data.decode('utf-8')  # Convert bytes to string
-            return json.loads(json_data)
+        return result
     
     async def upload_image(self, images: list, item_id: str):
         try:
-            access_token = await self.get_access_token()
             results = []
             
             async with httpx.AsyncClient() as client:
@@ -338,12 +430,7 @@ class ZohoAgent:
                         }
                         
                         # Upload to Zoho
-                        upload_response = await client.post(
-                            f"https://www.zohoapis.eu/inventory/v1/items/{item_id}/images",
-                            params={'organization_id': settings.ZOHO_ORGANIZATION_ID},
-                            headers={'Authorization': f"Zoho-oauthtoken {access_token}"},
-                            files=files
-                        )
+                        upload_response = await self.request("POST", f"/items/{item_id}/images", files=files)
 
                         if upload_response.status_code >= 400:
                             results.append({
@@ -361,53 +448,20 @@ class ZohoAgent:
             return {"error": f"Unexpected error: {str(e)}"}
     
     async def get_taxes(self):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("GET", f"/inventory/v1/settings/taxes?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        res = await self.request("GET", "/settings/taxes")
+        return res.json()
     
     async def get_item_groups(self):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("GET", f"/inventory/v1/itemgroups?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        """Every item group across all pages, in Zoho's response shape."""
+        return {"itemgroups": [record async for record in self.iter_item_groups()]}
     
     async def get_item_by_id(self, item_id: str):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("GET", f"/inventory/v1/items/{item_id}?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')  # Convert bytes to string
-        return json.loads(json_data)
+        res = await self.request("GET", f"/items/{item_id}")
+        return res.json()
     
-    async def create_item_group(self, item_group: ItemGroup):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        payload = json.dumps({
+    async def create_item_group(self, item_group: ItemGroup, woo_product_id: int | None = None, woo_variation_ids: dict[str, int] | None = None):
+        """Create an item group; with woo ids given, map each created item by its SKU to its variation."""
+        payload = {
             "group_name": item_group.group_name,
             "brand": item_group.brand,
             "manufacturer": item_group.manufacturer,
@@ -428,84 +482,59 @@ class ZohoAgent:
                 "sku": item.sku,
                 "attribute_option_name1": item.attribute_option_name1
             } for item in item_group.items],
-        })
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
+        }
         
-        conn.request("POST", f"/inventory/v1/itemgroups?organization_id={settings.ZOHO_ORGANIZATION_ID}", payload, headers)
+        res = await self.request("POST", "/itemgroups", json=payload)
+        result = res.json()
+        
+        created_items = result.get("item_group", {}).get("items", [])
+        if created_items:
+            await asyncio.to_thread(catalog.upsert, "zoho_items", created_items)
+        for item in created_items:
+            sku_index.add(item)
+        
+        if woo_product_id is not None and result.get("item_group"):
+            woo_variation_ids = woo_variation_ids or {}
+            item_payloads = {item["sku"]: item for item in payload["items"]}
+            mappings = []
+            for item in result["item_group"].get("items", []):
+                sku = item.get("sku")
+                if sku not in woo_variation_ids:
+                    continue
+                mappings.append(ItemMappingBase(
+                    woo_product_id=woo_product_id,
+                    woo_variation_id=woo_variation_ids[sku],
+                    sku=sku,
+                    zoho_item_id=item["item_id"],
+                    zoho_group_id=result["item_group"].get("group_id"),
+                    content_hash=content_hash({**payload, "items": [item_payloads.get(sku)]})
+                ))
+            if mappings:
+                await self.postgres_agent.upsert_items(mappings)
         
-        res = conn.getresponse()
-        status_code = res.status
-        if status_code == 429:
-            return {"limit_exceeded": True}
-        else:
-            data = res.read()
-            json_data = data.decode('utf-8')
-            return json.loads(json_data)
+        return result
     
     async def list_customers(self, first_name: str, last_name: str):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        # Properly encode query parameters
-        params = {
-            'organization_id': settings.ZOHO_ORGANIZATION_ID,
-            'first_name': first_name,
-            'last_name': last_name
-        }
-        query_params = urlencode(params)
-        
-        conn.request("GET", f"/inventory/v1/contacts?{query_params}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')
-        return json.loads(json_data)
+        res = await self.request("GET", "/contacts", params={"first_name": first_name, "last_name": last_name})
+        return res.json()
     
     async def get_orders(self):
-        access_token = await self.get_access_token()
-        
-        conn = http.client.HTTPSConnection("www.zohoapis.eu")
-        
-        headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
-        
-        conn.request("GET", f"/inventory/v1/salesorders?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        json_data = data.decode('utf-8')
-        return json.loads(json_data)
+        """Every sales order across all pages, in Zoho's response shape."""
+        return {"salesorders": [record async for record in self.iter_orders()]}
     
     async def create_order(self, order: Order):
         try:
-            access_token = await self.get_access_token()
-            
-            conn = http.client.HTTPSConnection("www.zohoapis.eu")
-            
             # Convert the order to a dictionary and remove None values
             order_dict = {k: v for k, v in order.model_dump().items() if v is not None}
-            payload = json.dumps(order_dict)
-            
-            headers = {
-                'Authorization': f"Zoho-oauthtoken {access_token}",
-                'Content-Type': 'application/json'  # Add content type header
-            }
-            
-            conn.request("POST", f"/inventory/v1/salesorders?organization_id={settings.ZOHO_ORGANIZATION_ID}", payload, headers)
             
-            res = conn.getresponse()
-            data = res.read()
-            json_data = data.decode('utf-8')
+            res = await self.request("POST", "/salesorders", json=order_dict)
             
             # Add error handling for non-200 responses
-            if res.status >= 400:
-                print(f"Zoho API error: Status {res.status}, Response: {json_data}")
+            if res.status_code >= 400:
+                print(f"Zoho API error: Status {res.status_code}, Response: {res.text}")
                 return None
             
-            return json.loads(json_data)
+            return res.json()
         except Exception as e:
             print(f"Error creating order in Zoho: {str(e)}")
             return None
@@ -513,25 +542,15 @@ class ZohoAgent:
     async def mark_order_as_confirmed(self, order_id: str):
         print(order_id)
         try:
-            access_token = await self.get_access_token()
-            
-            conn = http.client.HTTPSConnection("www.zohoapis.eu")
+            res = await self.request("POST", f"/salesorders/{order_id}/status/confirmed")
             
-            headers = { 'Authorization': f"Zoho-oauthtoken {access_token}" }
+            if res.status_code >= 400:
+                print(f"Zoho API error: Status {res.status_code}, Response: {res.text}")
+                return {"error": f"Failed to confirm order: {res.text}"}
             
-            conn.request("POST", f"/inventory/v1/salesorders/{order_id}/status/confirmed?organization_id={settings.ZOHO_ORGANIZATION_ID}", headers=headers)
+            return res.json()
             
-            res = conn.getresponse()
-            data = res.read()
-            json_data = data.decode('utf-8')
-            
-            if res.status >= 400:
-                print(f"Zoho API error: Status {res.status}, Response: {json_data}")
-                return {"error": f"Failed to confirm order: {json_data}"}
-            
-            return json.loads(json_data)
-            
-        except http.client.HTTPException as e:
+        except httpx.HTTPError as e:
             print(f"HTTP error occurred: {str(e)}")
             return {"error": f"HTTP error: {str(e)}"}
         except json.JSONDecodeError as e:
@@ -539,4 +558,4 @@ class ZohoAgent:
             return {"error": f"Invalid JSON response: {str(e)}"}
         except Exception as e:
             print(f"Unexpected error: {str(e)}")
-            return {"error": f"Unexpected error: {str(e)}"}
\ No newline at end of file
+            return {"error": f"Unexpected error: {str(e)}"}
@@ -1,22 +1,64 @@
 import asyncio
 import json, os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from app.agents.zoho import ZohoAgent
+from app.agents.http import close_clients
+from app.agents.postgres import dispose_engine
 from app.config import settings
 from app.sync.customer import sync_customers
 from app.agents.wcm import WcmAgent
-from app.sync.order import sync_orders, sync_order_one
+from app.sync.order import poll_orders, sync_order_one
+from app.sync.webhook import order_webhook_queue, process_order_webhooks, verify_signature
+from app.store.catalog import catalog
+from app.store.sku_index import sku_index
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    orders_task = asyncio.create_task(sync_orders())
+    token_task = asyncio.create_task(ZohoAgent().keep_access_token_fresh())
+    app.state.token_task = token_task
+    orders_task = asyncio.create_task(poll_orders())
     app.state.orders_task = orders_task
+    webhook_task = asyncio.create_task(process_order_webhooks())
+    app.state.webhook_task = webhook_task
     yield
-    orders_task.cancel()
+    tasks = [webhook_task, orders_task, token_task]
+    for task in tasks:
+        task.cancel()
+    # Let in-flight order pushes unwind before the clients and engine they use are closed
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_clients()
+    await dispose_engine()
 
 app = FastAPI(lifespan=lifespan)
 
+@app.post("/webhooks/woocommerce")
+async def woocommerce_webhook(request: Request):
+    body = await request.body()
+    signature = request.headers.get("X-WC-Webhook-Signature")
+    
+    # WooCommerce pings a new webhook with an unsigned form body and needs a 2xx to save it
+    if signature is None and body.startswith(b"webhook_id="):
+        return {"message": "pong"}
+    
+    if not verify_signature(body, signature):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    
+    topic = request.headers.get("X-WC-Webhook-Topic", "")
+    if not topic.startswith("order."):
+        return {"message": f"Ignored {topic}"}
+    
+    # A 5xx makes WooCommerce redeliver and eventually disable the webhook, so bad payloads get a 400
+    try:
+        order = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(order, dict) or "id" not in order:
+        raise HTTPException(status_code=400, detail="Order payload has no id")
+    
+    queued = order_webhook_queue.put(order)
+    return {"message": "queued" if queued else "coalesced"}
+
 @app.get("/oauth/callback")
 async def oauth_callback(request: Request):
     code = request.query_params.get('code')
@@ -62,16 +104,10 @@ async def get_taxes():
 
 @app.get("/products/delete")
 async def delete_products():
-    count = 0
-    while True:
-        file_path = f"zoho_items/items_{count}.json"
-        if not os.path.exists(file_path):
-            break
-        
-        os.remove(file_path)
-        count += 1
+    count = await asyncio.to_thread(catalog.clear, "zoho_items")
+    sku_index.invalidate()
         
-    return {"message": f"{count} files deleted"}
+    return {"message": f"{count} items deleted"}
 
 @app.get("/item_groups")
 async def get_item_groups():
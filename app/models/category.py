@@ -3,9 +3,9 @@ from sqlmodel import SQLModel, Field
 
 class CategoryBase(SQLModel):
     name: str
-    woo_id: int | None = Field(default=None)
+    woo_id: int | None = Field(default=None, unique=True, index=True)
     woo_parent_id: int | None = Field(default=None)
-    zoho_id: str | None = Field(default=None)
+    zoho_id: str | None = Field(default=None, unique=True, index=True)
     zoho_parent_id: str | None = Field(default=None)
     description: str | None = Field(default=None)
     url: str | None = Field(default=None)
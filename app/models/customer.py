@@ -3,8 +3,8 @@ from sqlmodel import SQLModel, Field
 
 class CustomerBase(SQLModel):
     contact_name: str
-    woo_id: int
-    zoho_id: str
+    woo_id: int = Field(unique=True, index=True)
+    zoho_id: str = Field(unique=True, index=True)
 
 class Customer(CustomerBase, table=True):
     __tablename__ = "customers"
@@ -0,0 +1,14 @@
+import uuid
+from sqlmodel import SQLModel, Field
+
+class GuestContactBase(SQLModel):
+    # Lowercased billing email, or "name:<first> <last>" when the order has no email
+    identity: str = Field(unique=True, index=True)
+    email: str | None = Field(default=None)
+    first_name: str
+    last_name: str
+    zoho_id: str = Field(index=True)
+
+class GuestContact(GuestContactBase, table=True):
+    __tablename__ = "guest_contacts"
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -0,0 +1,17 @@
+import uuid
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class ItemMappingBase(SQLModel):
+    woo_product_id: int = Field(index=True)
+    # 0 for simple products, the variation id for items created from a variable product
+    woo_variation_id: int = Field(default=0)
+    sku: str | None = Field(default=None, index=True)
+    zoho_item_id: str = Field(unique=True, index=True)
+    zoho_group_id: str | None = Field(default=None, index=True)
+    content_hash: str | None = Field(default=None)
+
+class ItemMapping(ItemMappingBase, table=True):
+    __tablename__ = "items"
+    __table_args__ = (UniqueConstraint("woo_product_id", "woo_variation_id", name="uq_items_woo_product_variation"),)
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -0,0 +1,12 @@
+import uuid
+from sqlmodel import SQLModel, Field
+
+class SyncWatermarkBase(SQLModel):
+    # e.g. "woocommerce_orders"
+    source: str = Field(unique=True, index=True)
+    # Highest date_modified_gmt synced so far, as WooCommerce formats it (ISO 8601, UTC)
+    value: str
+
+class SyncWatermark(SyncWatermarkBase, table=True):
+    __tablename__ = "sync_watermarks"
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -0,0 +1,13 @@
+import uuid
+from sqlmodel import SQLModel, Field
+
+class SyncedOrderBase(SQLModel):
+    woo_order_id: int = Field(unique=True, index=True)
+    zoho_salesorder_id: str = Field(index=True)
+    # Zoho sales order status after the last step that touched it, e.g. "draft" or "confirmed"
+    status: str
+    payload_hash: str
+
+class SyncedOrder(SyncedOrderBase, table=True):
+    __tablename__ = "synced_orders"
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -0,0 +1,24 @@
+from enum import Enum
+from pydantic import BaseModel
+
+class ReconcileStatus(str, Enum):
+    SYNCED = "synced"
+    MISSING = "missing"
+    NAME_MISMATCH = "name_mismatch"
+    SKU_MISMATCH = "sku_mismatch"
+
+class ReconcileEntry(BaseModel):
+    woo_id: int
+    name: str
+    sku: str
+    status: ReconcileStatus
+    zoho_item_id: str | None = None
+    zoho_name: str | None = None
+    zoho_sku: str | None = None
+
+class ReconcileReport(BaseModel):
+    products: int
+    zoho_items: int
+    counts: dict[ReconcileStatus, int]
+    entries: str
+    unsynced_items: str
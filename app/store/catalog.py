@@ -0,0 +1,130 @@
+import json, os, sqlite3, threading
+from typing import Iterator
+
+from app.config import settings
+
+# table -> (key field of the record, columns copied out of the record for indexed lookups)
+TABLES = {
+    "woo_products": ("id", ("sku", "name", "type")),
+    "woo_variations": ("id", ("sku", "parent_id")),
+    "woo_customers": ("id", ("email",)),
+    "woo_orders": ("id", ("customer_id", "status", "date_modified_gmt")),
+    "zoho_items": ("item_id", ("sku", "name")),
+}
+
+class CatalogStore:
+    """Embedded SQLite store for WooCommerce and Zoho records.
+
+    Each table keeps the full record as JSON next to a few indexed columns, so
+    records can be fetched by id or SKU and range-scanned in id order without
+    re-parsing whole exports.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = None
+        # One connection shared by the event loop and worker threads
+        self.lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for table, (key, columns) in TABLES.items():
+                key_type = "TEXT" if key == "item_id" else "INTEGER"
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id {key_type} PRIMARY KEY, {', '.join(columns)}, data TEXT NOT NULL)")
+                for column in columns:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+            conn.commit()
+            self.conn = conn
+        return self.conn
+
+    def execute(self, sql: str, params=()) -> list:
+        with self.lock:
+            conn = self.connect()
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+
+    def upsert(self, table: str, records: list[dict]) -> int:
+        key, columns = TABLES[table]
+        rows = [
+            (record[key], *(record.get(column) for column in columns), json.dumps(record, ensure_ascii=False))
+            for record in records
+        ]
+        placeholders = ", ".join("?" * (len(columns) + 2))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in (*columns, "data"))
+        with self.lock:
+            conn = self.connect()
+            conn.executemany(
+                f"INSERT INTO {table} (id, {', '.join(columns)}, data) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                rows
+            )
+            conn.commit()
+        return len(rows)
+
+    def get(self, table: str, key) -> dict | None:
+        rows = self.execute(f"SELECT data FROM {table} WHERE id = ?", (key,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_by_sku(self, table: str, sku: str) -> dict | None:
+        rows = self.execute(f"SELECT data FROM {table} WHERE sku = ? ORDER BY id LIMIT 1", (sku,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def find(self, table: str, **where) -> list[dict]:
+        return list(self.scan(table, where=where))
+
+    def scan(self, table: str, after=None, until=None, where: dict | None = None, batch_size: int = 500) -> Iterator[dict]:
+        """Yield records in id order, optionally limited to ids in (after, until] and exact column matches."""
+        _, columns = TABLES[table]
+        conditions = []
+        params = []
+        for column, value in (where or {}).items():
+            if column not in columns:
+                raise ValueError(f"{table}.{column} is not an indexed column")
+            conditions.append(f"{column} = ?")
+            params.append(value)
+        if until is not None:
+            conditions.append("id <= ?")
+            params.append(until)
+
+        last = after
+        while True:
+            page_conditions = conditions + (["id > ?"] if last is not None else [])
+            page_params = params + ([last] if last is not None else [])
+            where_sql = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+            # Keyset pagination: the lock is only held for one batch at a time
+            rows = self.execute(f"SELECT id, data FROM {table} {where_sql} ORDER BY id LIMIT ?", (*page_params, batch_size))
+            for _, data in rows:
+                yield json.loads(data)
+            if len(rows) < batch_size:
+                break
+            last = rows[-1][0]
+
+    def project(self, table: str, fields: tuple[str, ...], batch_size: int = 1000) -> Iterator[tuple]:
+        """Yield just `fields` of every record in id order, extracted by SQLite rather than parsed in Python."""
+        select = ", ".join(f"json_extract(data, '$.{field}')" for field in fields)
+        last = None
+        while True:
+            where_sql = "WHERE id > ?" if last is not None else ""
+            params = (last, batch_size) if last is not None else (batch_size,)
+            rows = self.execute(f"SELECT id, {select} FROM {table} {where_sql} ORDER BY id LIMIT ?", params)
+            for row in rows:
+                yield row[1:]
+            if len(rows) < batch_size:
+                break
+            last = rows[-1][0]
+
+    def count(self, table: str) -> int:
+        return self.execute(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    def clear(self, table: str) -> int:
+        count = self.count(table)
+        self.execute(f"DELETE FROM {table}")
+        return count
+
+catalog = CatalogStore(settings.CATALOG_DB_PATH)
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.store.zoho_item import ZohoItemRecord, load_zoho_items
+
+class SkuIndex:
+    """Process-wide SKU -> Zoho item map, built once from the catalog's Zoho item mirror."""
+    def __init__(self):
+        self.items: dict[str, ZohoItemRecord] = {}
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    def read_mirror(self) -> dict[str, ZohoItemRecord]:
+        items = {}
+        for item in load_zoho_items():
+            # First match wins, as with the old file scan
+            if item.sku:
+                items.setdefault(item.sku, item)
+        return items
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self.lock:
+            if self.loaded:
+                return
+            # Parse off the event loop, merge on it
+            items = await asyncio.to_thread(self.read_mirror)
+            # Items created while the mirror was loading are newer than the snapshot
+            items.update(self.items)
+            self.items = items
+            self.loaded = True
+            print(f"SKU index loaded with {len(self.items)} items")
+
+    def add(self, item: dict):
+        if item.get("sku"):
+            self.items[item["sku"]] = ZohoItemRecord.from_dict(item)
+
+    def get(self, sku: str) -> ZohoItemRecord | None:
+        return self.items.get(sku)
+
+    def invalidate(self):
+        self.items = {}
+        self.loaded = False
+
+sku_index = SkuIndex()
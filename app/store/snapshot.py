@@ -0,0 +1,97 @@
+import gzip, json, os
+from typing import Iterable, Iterator
+
+from app.config import settings
+
+try:
+    import zstandard  # Optional: smaller and faster than gzip when installed
+except ImportError:
+    zstandard = None
+
+SUFFIXES = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz", "none": ".jsonl"}
+
+def _open(path: str, mode: str):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but the zstandard package is not installed")
+        return zstandard.open(path, mode, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def snapshot_path(name: str) -> str:
+    """Path a snapshot called `name` is written to, e.g. products/new_products.jsonl.gz."""
+    compression = settings.SNAPSHOT_COMPRESSION
+    if compression == "zstd" and zstandard is None:
+        compression = "gzip"
+    return name + SUFFIXES[compression]
+
+def find_snapshot(name: str) -> str | None:
+    """Existing file for snapshot `name`, whatever compression it was written with."""
+    for suffix in SUFFIXES.values():
+        if os.path.exists(name + suffix):
+            return name + suffix
+    return None
+
+class SnapshotWriter:
+    """Append-only JSON Lines writer; the file only replaces the previous snapshot once closed cleanly.
+
+        with SnapshotWriter("products/new_products") as snapshot:
+            for product in products:
+                snapshot.write(product)
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.path = snapshot_path(name)
+        # Same suffix as the target so it is compressed the same way
+        self.tmp_path = snapshot_path(f"{name}.tmp")
+        self.file = None
+        self.count = 0
+
+    def __enter__(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = _open(self.tmp_path, "wt")
+        return self
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self.file.write("\n")
+        self.count += 1
+
+    def write_many(self, records: Iterable[dict]):
+        for record in records:
+            self.write(record)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is not None:
+            os.remove(self.tmp_path)
+            return
+        # Drop snapshots of the same name written with another compression
+        delete_snapshot(self.name)
+        os.replace(self.tmp_path, self.path)
+
+def write_snapshot(name: str, records: Iterable[dict]) -> int:
+    with SnapshotWriter(name) as snapshot:
+        snapshot.write_many(records)
+    return snapshot.count
+
+def read_snapshot(name: str) -> Iterator[dict]:
+    """Yield the records of snapshot `name` one at a time; yields nothing if it doesn't exist."""
+    path = find_snapshot(name)
+    if path is None:
+        return
+    with _open(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def delete_snapshot(name: str) -> bool:
+    deleted = False
+    for suffix in SUFFIXES.values():
+        if os.path.exists(name + suffix):
+            os.remove(name + suffix)
+            deleted = True
+    return deleted
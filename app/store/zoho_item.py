@@ -0,0 +1,39 @@
+import sys
+from typing import Iterator
+
+from app.store.catalog import catalog
+
+# The only Zoho item fields the sync reads
+ZOHO_ITEM_FIELDS = ("item_id", "name", "sku", "rate", "tax_id", "tax_name", "tax_percentage", "unit", "image_name", "description")
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class ZohoItemRecord:
+    """Slotted stand-in for a Zoho item dict, keeping only ZOHO_ITEM_FIELDS."""
+    __slots__ = ZOHO_ITEM_FIELDS
+
+    def __init__(self, item_id, name, sku, rate, tax_id, tax_name, tax_percentage, unit, image_name, description):
+        self.item_id = item_id
+        self.name = name
+        self.sku = sku
+        self.rate = rate
+        # Taxes and units repeat across the whole catalogue, so share one string each
+        self.tax_id = _intern(tax_id)
+        self.tax_name = _intern(tax_name)
+        self.tax_percentage = tax_percentage
+        self.unit = _intern(unit)
+        self.image_name = image_name
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "ZohoItemRecord":
+        return cls(*(item.get(field) for field in ZOHO_ITEM_FIELDS))
+
+    def __repr__(self):
+        return f"ZohoItemRecord(item_id={self.item_id!r}, sku={self.sku!r}, name={self.name!r})"
+
+def load_zoho_items() -> Iterator[ZohoItemRecord]:
+    """Stream the catalog's Zoho item mirror, projecting each item to a ZohoItemRecord."""
+    for row in catalog.project("zoho_items", ZOHO_ITEM_FIELDS):
+        yield ZohoItemRecord(*row)
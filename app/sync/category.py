@@ -2,6 +2,7 @@ import os, json
 from app.agents.zoho import ZohoAgent
 from app.agents.postgres import PostgresAgent
 from app.models.category import CategoryBase
+from app.config import settings
 
 async def create_category():
     count = 0
@@ -13,6 +14,9 @@ async def create_category():
         
         with open(filename, 'r') as f:
             categories = json.load(f)
+        
+        # Parents always live in an earlier level, so mappings only need to be flushed per level
+        pending_categories = []
             
         for category in categories:
             if category["woo_parent_id"] == 0:
@@ -29,7 +33,7 @@ async def create_category():
                 if result.get("category"):
                     category_base.zoho_id = result['category']['category_id']
                     category_base.zoho_parent_id = result['category']['parent_category_id']
-                    await PostgresAgent().insert_category(category_base)
+                    pending_categories.append(category_base)
                     print(f"Created category {category['name']} with id {category_base.zoho_id}")
                 
                 total_count += 1
@@ -49,7 +53,7 @@ async def create_category():
                     if result.get("category"):
                         category_base.zoho_id = result['category']['category_id']
                         category_base.zoho_parent_id = result['category']['parent_category_id']
-                        await PostgresAgent().insert_category(category_base)
+                        pending_categories.append(category_base)
                         print(f"Created category {category['name']} with id {category_base.zoho_id} deep {count}")
                     total_count += 1
                 else:
@@ -66,10 +70,16 @@ async def create_category():
                     if result.get("category"):
                         category_base.zoho_id = result['category']['category_id']
                         category_base.zoho_parent_id = result['category']['parent_category_id']
-                        await PostgresAgent().insert_category(category_base)
+                        pending_categories.append(category_base)
                         print(f"Created category {category['name']} with id {category_base.zoho_id}")
                     total_count += 1
             
+            if len(pending_categories) >= settings.MAPPING_FLUSH_SIZE:
+                await PostgresAgent().upsert_categories(pending_categories)
+                pending_categories = []
+        
+        if pending_categories:
+            await PostgresAgent().upsert_categories(pending_categories)
             
         count += 1
         print(f"{count} - Total count: {total_count}")
@@ -1,25 +1,29 @@
-import json
 from app.schemas.customer import Customer, BillingAddress, ShippingAddress, ContactPerson
 from app.agents.zoho import ZohoAgent
 from app.agents.postgres import PostgresAgent
 from app.models.customer import CustomerBase
+from app.config import settings
+from app.store.snapshot import find_snapshot, read_snapshot
+
+async def flush_customers(customers: list[CustomerBase]):
+    """Write a batch of customer mappings; on failure log the woo_id -> zoho_id pairs that weren't stored."""
+    try:
+        await PostgresAgent().upsert_customers(customers)
+    except Exception as e:
+        print(f"Error storing {len(customers)} customer mappings: {str(e)}")
+        for customer in customers:
+            print(f"Unstored customer mapping: woo_id {customer.woo_id} -> zoho_id {customer.zoho_id}")
 
 async def sync_customers():
     print("Syncing customers")
-    customers = []
+    # Customer mappings are written to Postgres in batches instead of one row at a time
+    pending_customers = []
     
-    # File handling error
-    try:
-        with open("customers/real_customers.json", "r") as f:
-            customers = json.load(f)
-    except FileNotFoundError:
-        print("Error: customers/real_customers.json file not found")
-        return
-    except json.JSONDecodeError:
-        print("Error: Invalid JSON format in customers file")
+    if find_snapshot("customers/real_customers") is None:
+        print("Error: customers/real_customers snapshot not found")
         return
     
-    for customer in customers:
+    for customer in read_snapshot("customers/real_customers"):
         try:
             # First try to get company name from billing company
             company_name = customer.get('billing', {}).get('company', '')
@@ -73,7 +77,7 @@ async def sync_customers():
                     woo_id=customer["id"],
                     zoho_id=contact_zoho_id
                 )
-                await PostgresAgent().insert_customer(pg_customer)
+                pending_customers.append(pg_customer)
                 print(contact_zoho_id)
             else:
                 print(f"Error: {result['message']}")
@@ -86,4 +90,11 @@ async def sync_customers():
         except Exception as e:
             print(f"Unexpected error while processing customer: {str(e)}")
             continue
-        
\ No newline at end of file
+        
+        # Outside the per-customer try, so a failed batch is logged and dropped instead of retried by every later row
+        if len(pending_customers) >= settings.MAPPING_FLUSH_SIZE:
+            await flush_customers(pending_customers)
+            pending_customers = []
+    
+    if pending_customers:
+        await flush_customers(pending_customers)
@@ -0,0 +1,216 @@
+import asyncio, time
+from contextlib import asynccontextmanager
+
+from app.agents.postgres import PostgresAgent
+from app.agents.zoho import ZohoAgent
+from app.config import settings
+from app.models.customer import CustomerBase
+from app.models.guest_contact import GuestContactBase
+from app.schemas.customer import Customer, BillingAddress, ShippingAddress, ContactPerson
+
+def guest_identity(order: dict) -> str | None:
+    """Key for the guest contact index: the billing email, else the billing name; None without a full name."""
+    billing = order.get("billing", {})
+    first_name = billing.get("first_name", "")
+    last_name = billing.get("last_name", "")
+    if not first_name or not last_name:
+        return None
+    email = (billing.get("email") or "").strip().lower()
+    if email:
+        return email
+    return f"name:{first_name.strip().lower()} {last_name.strip().lower()}"
+
+class CustomerResolver:
+    """Resolves the Zoho contact of Woo orders, batch-loading known contacts before touching the Zoho API.
+
+    Registered customers are looked up in `customers` by woo_id and guests in `guest_contacts`
+    by email/name, one IN query per batch. Only unknown identities are searched for or created
+    in Zoho, and what is found or created is stored so the next order costs no API call.
+    Misses are only trusted for CUSTOMER_MISS_TTL seconds, and are always re-checked before creating.
+    """
+    def __init__(self):
+        self.by_woo_id: dict[int, str] = {}
+        self.by_identity: dict[str, str] = {}
+        # When a key was last looked up in Postgres and not found
+        self.missed_woo_ids: dict[int, float] = {}
+        self.missed_identities: dict[str, float] = {}
+        # identity -> (lock, coroutines holding or waiting for it)
+        self.locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    def is_known_miss(self, misses: dict, key) -> bool:
+        missed_at = misses.get(key)
+        return missed_at is not None and time.monotonic() - missed_at < settings.CUSTOMER_MISS_TTL
+
+    async def prefetch(self, orders: list[dict], fresh: bool = False):
+        """Load the contacts of `orders` from Postgres in one query per table; `fresh` ignores cached misses."""
+        postgres_agent = PostgresAgent()
+
+        woo_ids = {
+            order["customer_id"] for order in orders
+            if order.get("customer_id") and order["customer_id"] not in self.by_woo_id
+            and (fresh or not self.is_known_miss(self.missed_woo_ids, order["customer_id"]))
+        }
+        if woo_ids:
+            customers = await postgres_agent.get_customers_by_woo_ids(list(woo_ids))
+            self.by_woo_id.update({woo_id: customer.zoho_id for woo_id, customer in customers.items()})
+            now = time.monotonic()
+            for woo_id in woo_ids:
+                if woo_id in customers:
+                    self.missed_woo_ids.pop(woo_id, None)
+                else:
+                    self.missed_woo_ids[woo_id] = now
+
+        identities = set()
+        for order in orders:
+            if order.get("customer_id") in self.by_woo_id:
+                continue
+            identity = guest_identity(order)
+            if identity and identity not in self.by_identity and (fresh or not self.is_known_miss(self.missed_identities, identity)):
+                identities.add(identity)
+        if identities:
+            contacts = await postgres_agent.get_guest_contacts(list(identities))
+            self.by_identity.update({identity: contact.zoho_id for identity, contact in contacts.items()})
+            now = time.monotonic()
+            for identity in identities:
+                if identity in contacts:
+                    self.missed_identities.pop(identity, None)
+                else:
+                    self.missed_identities[identity] = now
+
+    @asynccontextmanager
+    async def identity_lock(self, identity: str):
+        """Serialise work on one identity; the lock is dropped once nobody holds or waits for it."""
+        lock, users = self.locks.get(identity, (asyncio.Lock(), 0))
+        self.locks[identity] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self.locks[identity]
+            if users == 1:
+                del self.locks[identity]
+            else:
+                self.locks[identity] = (lock, users - 1)
+
+    async def resolve(self, order: dict) -> str:
+        """Zoho contact id for `order`, or "" when its billing details can't identify a customer.
+
+        Raises when Zoho fails, so the order is retried instead of being dropped.
+        """
+        await self.prefetch([order])
+
+        woo_id = order.get("customer_id")
+        if woo_id and woo_id in self.by_woo_id:
+            return self.by_woo_id[woo_id]
+
+        identity = guest_identity(order)
+        if identity is None:
+            print("Missing required billing name fields")
+            return ""
+        if identity in self.by_identity:
+            return self.by_identity[identity]
+
+        # Concurrent orders from the same new customer must not create two contacts
+        async with self.identity_lock(identity):
+            # The cached miss may be stale: another process could have stored this customer since
+            await self.prefetch([order], fresh=True)
+            if woo_id and woo_id in self.by_woo_id:
+                return self.by_woo_id[woo_id]
+            if identity in self.by_identity:
+                return self.by_identity[identity]
+
+            contact_id, created = await self.find_or_create(order)
+            if contact_id:
+                await self.remember(order, identity, contact_id, created)
+            return contact_id
+
+    async def find_or_create(self, order: dict) -> tuple[str, bool]:
+        billing = order.get("billing", {})
+        first_name = billing.get("first_name", "")
+        last_name = billing.get("last_name", "")
+
+        # Try to find existing customer by name
+        print(f"Searching for customer: {first_name} {last_name}")
+        result = await ZohoAgent().list_customers(first_name, last_name)
+        if result.get("code", 0) != 0:
+            raise RuntimeError(f"Zoho contact search failed for {first_name} {last_name}: {result.get('message')}")
+        if result.get("contacts"):
+            return result["contacts"][0]["contact_id"], False
+
+        try:
+            # Determine company name using fallbacks
+            company_name = (
+                billing.get("company")
+                or order.get("company_name")
+                or f"{first_name} {last_name}".strip()
+            )
+
+            if not company_name:
+                print("Unable to determine company name - missing required fields")
+                return "", False
+
+            # Create new customer
+            customer_base = Customer(
+                contact_name=f"{first_name} {last_name}",
+                company_name=company_name,
+                contact_type="customer",
+                billing_address=BillingAddress(
+                    address=billing["address_1"],
+                    city=billing["city"],
+                    state=billing["state"],
+                    zip=billing["postcode"],
+                    country=billing["country"],
+                ),
+                shipping_address=ShippingAddress(
+                    address=order["shipping"]["address_1"],
+                    city=order["shipping"]["city"],
+                    state=order["shipping"]["state"],
+                    zip=order["shipping"]["postcode"],
+                    country=order["shipping"]["country"],
+                ),
+                contact_persons=[ContactPerson(
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=billing["email"],
+                    is_primary_contact=True,
+                )],
+            )
+
+        except (KeyError, ValueError) as e:
+            # Incomplete or invalid address details won't get better on a retry
+            print(f"Order {order.get('id')} has unusable customer details: {str(e)}")
+            return "", False
+
+        c_result = await ZohoAgent().create_customer(customer_base)
+        if "contact" not in c_result:
+            raise RuntimeError(f"Zoho contact for {company_name} was not created: {c_result.get('message') or c_result.get('error')}")
+        print(f"Created new customer: {company_name}")
+        return c_result['contact']['contact_id'], True
+
+    async def remember(self, order: dict, identity: str, contact_id: str, created: bool):
+        billing = order.get("billing", {})
+        self.by_identity[identity] = contact_id
+        self.missed_identities.pop(identity, None)
+        postgres_agent = PostgresAgent()
+        try:
+            await postgres_agent.upsert_guest_contact(GuestContactBase(
+                identity=identity,
+                email=(billing.get("email") or "").strip().lower() or None,
+                first_name=billing.get("first_name", ""),
+                last_name=billing.get("last_name", ""),
+                zoho_id=contact_id
+            ))
+            # customers.zoho_id is unique, so only a contact created for this customer is mapped to its woo_id
+            woo_id = order.get("customer_id")
+            if created and woo_id:
+                await postgres_agent.upsert_customers([CustomerBase(
+                    contact_name=f"{billing.get('first_name', '')} {billing.get('last_name', '')}",
+                    woo_id=woo_id,
+                    zoho_id=contact_id
+                )])
+                self.by_woo_id[woo_id] = contact_id
+                self.missed_woo_ids.pop(woo_id, None)
+        except Exception as e:
+            print(f"Error storing contact {contact_id}: {str(e)}")
+
+customer_resolver = CustomerResolver()
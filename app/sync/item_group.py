@@ -1,20 +1,19 @@
-import os, json
 from app.schemas.item_group import ItemGroup, Item, Attribute
 from app.agents.postgres import PostgresAgent
 from app.agents.zoho import ZohoAgent
+from app.store.catalog import catalog
 from bs4 import BeautifulSoup
-import unicodedata
-async def create_item_groups():
+import asyncio, unicodedata
+async def create_item_groups(after_id: int | None = None, until_id: int | None = None):
+    """Create Zoho item groups for the catalog's variable products with ids in (after_id, until_id]."""
     try:
         print("Starting item group creation")
         
-        filename = f"variable_products/products_9.json"
-        
-        try:
-            with open(filename, 'r') as f:
-                products = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Error loading products file: {str(e)}")
+        products = await asyncio.to_thread(
+            lambda: list(catalog.scan("woo_products", after=after_id, until=until_id, where={"type": "variable"}))
+        )
+        if not products:
+            print("No variable products in the catalog")
             return
         
         failed_count = 0
@@ -24,31 +23,19 @@ async def create_item_groups():
                 continue
             
             try:
-                category = None  # Initialize category
+                category_id = ""
                 if len(product["categories"]) > 0:
                     category_woo_id = product["categories"][0]["id"]
-                    category = await PostgresAgent().get_category_by_woo_id(category_woo_id)
-                
-                if category:
-                    category_id = category.zoho_id
-                else:
-                    category_id = ""
+                    category_id = await PostgresAgent().get_category_zoho_id(category_woo_id) or ""
                     
                 group_items = []
-                item_filename = f"variations/variations_{product['id']}.json"
-                if not os.path.exists(item_filename):
-                    print(f"Variations file not found for product ID: {product.get('id')}")
-                    continue
-                
-                try:
-                    with open(item_filename, 'r') as f:
-                        items = json.load(f)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
-                    print(f"Error loading variations file for product {product.get('id')}: {str(e)}")
-                    failed_count += 1
+                items = await asyncio.to_thread(catalog.find, "woo_variations", parent_id=product["id"])
+                if not items:
+                    print(f"No variations found for product ID: {product.get('id')}")
                     continue
                 
                 item_images_list = []
+                woo_variation_ids = {}
                 for item in items:
                     if len(item['attributes']) == 0:
                         continue
@@ -103,6 +90,7 @@ async def create_item_groups():
                     }
                     
                     item_images_list.append(item_images)
+                    woo_variation_ids[sku] = item["id"]
                     
                     group_items.append(single_item)
                 
@@ -143,7 +131,7 @@ async def create_item_groups():
                 )
                 
                 try:
-                    result = await ZohoAgent().create_item_group(item_group)
+                    result = await ZohoAgent().create_item_group(item_group, woo_product_id=product["id"], woo_variation_ids=woo_variation_ids)
                 except Exception as e:
                     print(f"Error creating item group for product {product.get('id')}: {str(e)}")
                     failed_count += 1
@@ -153,10 +141,6 @@ async def create_item_groups():
                     print(f"invalid description: {truncated_description}")
                     continue
                 
-                if result.get("limit_exceeded"):
-                    print(f"API limit exceeded. Stopping process.")
-                    return
-                
                 if "item_group" not in result:
                     print(f"API Response: {result}")
                     failed_count += 1
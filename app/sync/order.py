@@ -1,104 +1,84 @@
-import os, json, asyncio
+import asyncio
+from itertools import islice
+from datetime import datetime, timedelta, timezone
 from app.agents.zoho import ZohoAgent
-from app.schemas.customer import Customer, BillingAddress, ShippingAddress, ContactPerson
+from app.agents.wcm import WcmAgent
 from app.schemas.order import LineItem, Order
-from app.agents.postgres import PostgresAgent
+from app.models.synced_order import SyncedOrderBase
+from app.agents.postgres import PostgresAgent, content_hash
+from app.config import settings
+from app.store.catalog import catalog
+from app.store.sku_index import sku_index
+from app.sync.customer_resolver import customer_resolver
+from app.sync.pipeline import Stage, run_pipeline
 
-async def fetch_customer_id(order: dict):
-    # Check existing customer first
-    if order["customer_id"] != 0:
-        customer = await PostgresAgent().get_customer_by_woo_id(order["customer_id"])
-        if customer is not None:
-            return customer.zoho_id
-    
-    # Extract billing info with defaults
-    billing = order.get("billing", {})
-    first_name = billing.get("first_name", "")
-    last_name = billing.get("last_name", "")
-    
-    if not first_name or not last_name:
-        print("Missing required billing name fields")
-        return ""
+ORDERS_WATERMARK = "woocommerce_orders"
+# Set once the sales orders already in Zoho have been copied into the ledger
+LEDGER_SEED_WATERMARK = "zoho_salesorders"
 
-    try:
-        # Try to find existing customer by name
-        print(f"Searching for customer: {first_name} {last_name}")
-        result = await ZohoAgent().list_customers(first_name, last_name)
-        if result.get("contacts"):
-            return result["contacts"][0]["contact_id"]
+# Woo order ids with a sales order creation in flight in this process
+orders_being_created: set[int] = set()
+ledger_seed_lock = asyncio.Lock()
+ledger_seeded = False
 
-        # Determine company name using fallbacks
-        company_name = (
-            billing.get("company")
-            or order.get("company_name")
-            or f"{first_name} {last_name}".strip()
-        )
-        
-        if not company_name:
-            print("Unable to determine company name - missing required fields")
-            return ""
+async def seed_order_ledger():
+    """Copy the sales orders already in Zoho into the synced_orders ledger, once per database.
 
-        # Create new customer
-        customer_base = Customer(
-            contact_name=f"{first_name} {last_name}",
-            company_name=company_name,
-            contact_type="customer",
-            billing_address=BillingAddress(
-                address=billing["address_1"],
-                city=billing["city"],
-                state=billing["state"],
-                zip=billing["postcode"],
-                country=billing["country"],
-            ),
-            shipping_address=ShippingAddress(
-                address=order["shipping"]["address_1"],
-                city=order["shipping"]["city"],
-                state=order["shipping"]["state"],
-                zip=order["shipping"]["postcode"],
-                country=order["shipping"]["country"],
-            ),
-            contact_persons=[ContactPerson(
-                first_name=first_name,
-                last_name=last_name,
-                email=billing["email"],
-                is_primary_contact=True,
-            )],
-        )
-        
-        c_result = await ZohoAgent().create_customer(customer_base)
-        print(f"Created new customer: {company_name}")
-        return c_result['contact']['contact_id']
+    Orders pushed before the ledger existed are only known to Zoho, as sales orders whose
+    reference_number is the Woo order id. Until they are in the ledger, any of them read
+    again from WooCommerce would be created a second time, so nothing is pushed before this ran.
+    """
+    global ledger_seeded
+    if ledger_seeded:
+        return
+    async with ledger_seed_lock:
+        if ledger_seeded:
+            return
+        postgres_agent = PostgresAgent()
+        if not await postgres_agent.get_watermark(LEDGER_SEED_WATERMARK):
+            zoho_agent = ZohoAgent()
+            seeded = 0
+            page = 1
+            while True:
+                # Paged by hand: a failed page must abort the seed rather than leave a gap
+                json_data = await zoho_agent.get_page("/salesorders", page)
+                if json_data.get("code", 0) != 0:
+                    raise RuntimeError(f"Zoho error on sales orders page {page}: {json_data.get('message')}")
+                seeded += await postgres_agent.add_synced_orders([
+                    SyncedOrderBase(
+                        woo_order_id=int(salesorder["reference_number"]),
+                        zoho_salesorder_id=salesorder["salesorder_id"],
+                        status=salesorder.get("status", ""),
+                        # Unknown: the payload they were created from was never stored
+                        payload_hash=""
+                    )
+                    for salesorder in json_data.get("salesorders") or []
+                    if str(salesorder.get("reference_number") or "").isdigit()
+                ])
+                if not json_data.get("page_context", {}).get("has_more_page", False):
+                    break
+                page += 1
+            await postgres_agent.set_watermark(LEDGER_SEED_WATERMARK, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+            print(f"Seeded the order ledger with {seeded} sales orders from Zoho")
+        ledger_seeded = True
 
-    except Exception as e:
-        print(f"Error processing customer: {str(e)}")
-        return ""
+async def fetch_customer_id(order: dict):
+    return await customer_resolver.resolve(order)
 
 async def search_sku_item(sku: str):
-    count = 0
-    while True:
-        file_path = f"zoho_items/items_{count}.json"
-        if not os.path.exists(file_path):
-            break
-        
-        with open(file_path, "r") as f:
-            items = json.load(f)
-            
-        for item in items:
-            if item["sku"] == sku:
-                return item
-            
-        count += 1
-        
-    return None
+    await sku_index.ensure_loaded()
+    return sku_index.get(sku)
 
 async def fetch_line_items(order: dict):
+    await sku_index.ensure_loaded()
+    
     items = []
     for item in order["line_items"]:
-        zoho_item = await search_sku_item(item["sku"])
+        zoho_item = sku_index.get(item["sku"])
         if zoho_item is None:
             continue
         
-        rate = float(item["subtotal"])/float(item["quantity"]) if float(item["subtotal"]) != 0 and float(item['quantity']) != 0 else float(zoho_item["rate"])
+        rate = float(item["subtotal"])/float(item["quantity"]) if float(item["subtotal"]) != 0 and float(item['quantity']) != 0 else float(zoho_item.rate)
         
         
         tax_id = None
@@ -106,17 +86,17 @@ async def fetch_line_items(order: dict):
         tax_percentage = None
         
         if len(order["tax_lines"]) > 0:
-            tax_id = zoho_item["tax_id"]
-            tax_name = zoho_item["tax_name"]
-            tax_percentage = zoho_item["tax_percentage"]
+            tax_id = zoho_item.tax_id
+            tax_name = zoho_item.tax_name
+            tax_percentage = zoho_item.tax_percentage
             
         line_item = LineItem(
-            item_id=zoho_item["item_id"],
-            name=zoho_item["name"],
-            description=zoho_item["description"],
+            item_id=zoho_item.item_id,
+            name=zoho_item.name,
+            description=zoho_item.description,
             rate=rate,
             quantity=item["quantity"],
-            unit=zoho_item["unit"],
+            unit=zoho_item.unit,
             tax_id=tax_id,
             tax_name=tax_name,
             tax_percentage=tax_percentage,
@@ -134,94 +114,251 @@ async def calculate_discount(order: dict, line_items: list[LineItem]):
         print(f"Invalid discount_total value, defaulting to 0")
         return 0.0
 
+async def build_order(order: dict, customer_id: str, line_items: list[LineItem]) -> Order:
+    discount = await calculate_discount(order, line_items)
+    
+    shipping_charge = 0.0
+    try:
+        shipping_total = float(order["shipping_total"]) if order["shipping_total"] else 0.0
+        shipping_tax = float(order["shipping_tax"]) if order["shipping_tax"] else 0.0
+        shipping_charge = shipping_total + shipping_tax
+    except (ValueError, TypeError):
+        shipping_charge = 0.0
+    
+    delivery_method = ""
+    try:
+        if len(order["shipping_lines"]) > 0:
+            delivery_method = order["shipping_lines"][0]["method_title"]
+        else:
+            delivery_method = "Pickup"
+    except (ValueError, TypeError):
+        delivery_method = "Pickup"
+    
+    tax_total = 0.0
+    try:
+        tax_total = float(order["total_tax"]) if order["total_tax"] else 0.0
+    except (ValueError, TypeError):
+        print(f"Invalid total_tax value, defaulting to 0")
+        tax_total = 0.0
+    
+    return Order(
+        customer_id=customer_id,
+        date=order["date_created"].split('T')[0],
+        shipment_date=order["date_completed"].split('T')[0],
+        reference_number=str(order["id"]),
+        line_items=line_items,
+        notes=order["customer_note"],
+        discount=discount,
+        is_discount_before_tax=True,
+        discount_type="entity_level",
+        shipping_charge=shipping_charge,
+        delivery_method=delivery_method,
+        status="Confirmed",
+        tax_total=tax_total
+    )
+
+async def resolve_order(order: dict) -> tuple[dict, Order] | None:
+    """Resolve the Zoho customer and line items of a Woo order; None when it can never be synced.
+
+    Zoho errors raise instead, so the order is retried rather than skipped.
+    """
+    customer_id = await fetch_customer_id(order)
+    if customer_id == "":
+        return None
+    
+    line_items = await fetch_line_items(order)
+    if len(line_items) == 0:
+        return None
+    
+    return order, await build_order(order, customer_id, line_items)
+
+async def create_sales_order(resolved: tuple[dict, Order]) -> tuple[dict, dict] | None:
+    order, order_base = resolved
+    # The poller and the webhook worker can reach the same order; only one may create it
+    if order["id"] in orders_being_created:
+        print(f"Order {order['id']} is already being created")
+        return None
+    orders_being_created.add(order["id"])
+    try:
+        if await PostgresAgent().get_synced_orders([order["id"]]):
+            print(f"Order {order['id']} was synced meanwhile")
+            return None
+        
+        result = await ZohoAgent().create_order(order_base)
+        if not result or "salesorder" not in result:
+            # Raise rather than drop, so the pipeline reports it and the watermark stays before it
+            raise RuntimeError(f"Sales order for order {order['id']} was not created: {result}")
+        salesorder = result["salesorder"]
+        # Record the sales order before anything else can fail, so a restart never creates it twice
+        await record_synced_order(order, salesorder["salesorder_id"], salesorder.get("status", ""))
+        return order, salesorder
+    finally:
+        orders_being_created.discard(order["id"])
+
+async def confirm_sales_order(created: tuple[dict, dict]) -> dict:
+    order, salesorder = created
+    if salesorder.get("status") == "draft":
+        print("Draft order created")
+        confirmed_result = await ZohoAgent().mark_order_as_confirmed(salesorder.get("salesorder_id"))
+        print(confirmed_result)
+        if confirmed_result.get("code") != 0:
+            # Left as a draft in the ledger; unsynced_orders confirms it when the order is read again
+            raise RuntimeError(f"Sales order {salesorder['salesorder_id']} for order {order['id']} was not confirmed: {confirmed_result}")
+        await record_synced_order(order, salesorder["salesorder_id"], "confirmed")
+    return salesorder
+
+async def record_synced_order(order: dict, salesorder_id: str, status: str):
+    await PostgresAgent().upsert_synced_order(SyncedOrderBase(
+        woo_order_id=order["id"],
+        zoho_salesorder_id=salesorder_id,
+        status=status,
+        payload_hash=content_hash(order)
+    ))
+
+async def unsynced_orders(orders, batch_size: int | None = None):
+    """Yield the orders with no sales order in the synced_orders ledger, checking it once per batch.
+
+    Orders whose sales order was created but left in draft are confirmed here instead.
+    """
+    batch_size = batch_size or settings.ORDER_LEDGER_BATCH_SIZE
+    skipped = 0
+    
+    async def check(batch: list[dict]):
+        nonlocal skipped
+        synced = await PostgresAgent().get_synced_orders([order["id"] for order in batch])
+        pending = []
+        for order in batch:
+            entry = synced.get(order["id"])
+            if entry is None:
+                pending.append(order)
+                continue
+            skipped += 1
+            if entry.status == "draft":
+                await confirm_sales_order((order, {"salesorder_id": entry.zoho_salesorder_id, "status": entry.status}))
+            elif entry.payload_hash and entry.payload_hash != content_hash(order):
+                print(f"Order {order['id']} changed after it was synced to sales order {entry.zoho_salesorder_id}")
+        # Resolve the batch's known customers and guests in two queries rather than one per order
+        await customer_resolver.prefetch(pending)
+        return pending
+    
+    batch = []
+    for order in orders:
+        batch.append(order)
+        if len(batch) >= batch_size:
+            for pending in await check(batch):
+                yield pending
+            batch = []
+    if batch:
+        for pending in await check(batch):
+            yield pending
+    
+    print(f"Skipped {skipped} orders already in the ledger")
+
+async def sync_order(order: dict):
+    try:
+        await seed_order_ledger()
+        if await PostgresAgent().get_synced_orders([order["id"]]):
+            print(f"Order {order['id']} is already synced")
+            return
+        
+        resolved = await resolve_order(order)
+        if resolved is None:
+            return
+        
+        created = await create_sales_order(resolved)
+        if created is None:
+            return
+        
+        await confirm_sales_order(created)
+    except KeyError as e:
+        print(f"Missing required field in order: {str(e)}")
+    except Exception as e:
+        print(f"Unexpected error processing order: {str(e)}")
+
+async def run_order_pipeline(orders):
+    """Push `orders` that aren't in the synced_orders ledger to Zoho; returns the pipeline stages.
+
+    Orders flow through resolve -> create -> confirm stages, each with its own worker pool;
+    the Zoho calls all go through the shared rate limiter.
+    """
+    await seed_order_ledger()
+    await sku_index.ensure_loaded()
+    return await run_pipeline(
+        unsynced_orders(orders),
+        [
+            Stage("resolve", resolve_order, settings.ORDER_RESOLVE_WORKERS),
+            Stage("create", create_sales_order, settings.ORDER_CREATE_WORKERS),
+            Stage("confirm", confirm_sales_order, settings.ORDER_CONFIRM_WORKERS),
+        ],
+        settings.ORDER_QUEUE_SIZE,
+    )
+
+async def completed_catalog_orders(after_id: int):
+    """Completed catalog orders with ids above `after_id`, read a batch at a time off the event loop."""
+    orders = catalog.scan("woo_orders", after=after_id, where={"status": "completed"})
+    while True:
+        batch = await asyncio.to_thread(lambda: list(islice(orders, settings.ORDER_LEDGER_BATCH_SIZE)))
+        if not batch:
+            return
+        for order in batch:
+            yield order
+
 async def sync_orders():
-    count = 7
+    """Push the catalog's completed orders to Zoho, starting after ORDER_SYNC_AFTER_ID."""
+    print("Syncing orders")
+    await run_order_pipeline(completed_catalog_orders(settings.ORDER_SYNC_AFTER_ID))
+        
+    print("All orders synced")
+
+async def sync_orders_incremental():
+    """Fetch and sync only the orders modified since the stored watermark, then advance it."""
+    postgres_agent = PostgresAgent()
+    watermark = await postgres_agent.get_watermark(ORDERS_WATERMARK)
+    if watermark is None:
+        # First run: continue from the newest order already exported to the catalog
+        watermark = (await asyncio.to_thread(catalog.execute, "SELECT MAX(date_modified_gmt) FROM woo_orders"))[0][0]
+    
+    modified_after = None
+    if watermark:
+        # Re-read a short overlap so orders sharing the boundary second aren't missed; the ledger skips repeats
+        modified_after = (datetime.fromisoformat(watermark) - timedelta(seconds=settings.ORDER_POLL_OVERLAP)).isoformat(timespec="seconds")
+    
+    orders = await WcmAgent().get_orders_modified_after(modified_after)
+    print(f"Found {len(orders)} orders modified after {modified_after}")
+    if not orders:
+        return
+    
+    stages = await run_order_pipeline(orders)
+    failed_ids = {
+        (item if isinstance(item, dict) else item[0])["id"]
+        for stage in stages
+        for item in stage.failed_items
+    }
+    
+    # Advance only to the last order before the first one that failed, so it is re-read next time
+    latest = None
+    for order in sorted(orders, key=lambda order: order["date_modified_gmt"]):
+        if order["id"] in failed_ids:
+            print(f"Order {order['id']} failed, holding the watermark at {latest or watermark}")
+            break
+        latest = order["date_modified_gmt"]
+    
+    if latest and (watermark is None or latest > watermark):
+        await postgres_agent.set_watermark(ORDERS_WATERMARK, latest)
+
+async def poll_orders():
+    """Drain the catalog backlog once, then pick up modified orders every ORDER_POLL_INTERVAL seconds."""
+    try:
+        await sync_orders()
+    except Exception as e:
+        print(f"Error syncing order backlog: {str(e)}")
+    
     while True:
+        await asyncio.sleep(settings.ORDER_POLL_INTERVAL)
         try:
-            print("Syncing orders")
-            file_path = f"orders/orders_{count}.json"
-            if not os.path.exists(file_path):
-                print(f"File not found: {file_path}")
-                break
-            
-            with open(file_path, "r") as f:
-                orders = json.load(f)
-            
-            for order in orders:
-                try:
-                    customer_id = await fetch_customer_id(order)
-                    if customer_id == "":
-                        continue
-                    
-                    line_items = await fetch_line_items(order)
-                    if len(line_items) == 0:
-                        continue
-                    
-                    discount = await calculate_discount(order, line_items)
-                    
-                    shipping_charge = 0.0
-                    try:
-                        shipping_total = float(order["shipping_total"]) if order["shipping_total"] else 0.0
-                        shipping_tax = float(order["shipping_tax"]) if order["shipping_tax"] else 0.0
-                        shipping_charge = shipping_total + shipping_tax
-                    except (ValueError, TypeError):
-                        shipping_charge = 0.0
-                    
-                    delivery_method = ""
-                    try:
-                        if len(order["shipping_lines"]) > 0:
-                            delivery_method = order["shipping_lines"][0]["method_title"]
-                        else:
-                            delivery_method = "Pickup"
-                    except (ValueError, TypeError):
-                        delivery_method = "Pickup"
-                    
-                    tax_total = 0.0
-                    try:
-                        tax_total = float(order["total_tax"]) if order["total_tax"] else 0.0
-                    except (ValueError, TypeError):
-                        print(f"Invalid total_tax value, defaulting to 0")
-                        tax_total = 0.0
-                    
-                    order_base = Order(
-                        customer_id=customer_id,
-                        date=order["date_created"].split('T')[0],
-                        shipment_date=order["date_completed"].split('T')[0],
-                        reference_number=str(order["id"]),
-                        line_items=line_items,
-                        notes=order["customer_note"],
-                        discount=discount,
-                        is_discount_before_tax=True,
-                        discount_type="entity_level",
-                        shipping_charge=shipping_charge,
-                        delivery_method=delivery_method,
-                        status="Confirmed",
-                        tax_total=tax_total
-                    )
-                    
-                    result = await ZohoAgent().create_order(order_base)
-                    if result.get("salesorder", {}).get("status") == "draft":
-                        print("Draft order created")
-                        confirmed_result = await ZohoAgent().mark_order_as_confirmed(result.get("salesorder", {}).get("salesorder_id"))
-                        print(confirmed_result)
-                except KeyError as e:
-                    print(f"Missing required field in order: {str(e)}")
-                    continue
-                except Exception as e:
-                    print(f"Unexpected error processing order: {str(e)}")
-                    continue
-            
-            print(f"Orders synced of {count}")
-            count += 1
-            await asyncio.sleep(1)
-        except json.JSONDecodeError as e:
-            print(f"Error reading JSON file: {str(e)}")
-            count += 1
+            await sync_orders_incremental()
         except Exception as e:
-            print(f"Unexpected error in sync_orders: {str(e)}")
-            count += 1
-        
-    print("All orders synced")
+            print(f"Error in incremental order sync: {str(e)}")
 
 async def sync_order_one():
     
@@ -368,66 +505,6 @@ async def sync_order_one():
         "date_paid_gmt": "2025-01-23T21:02:55",
         "currency_symbol": "kr"
     }
+
     
-    
-    try:
-        customer_id = await fetch_customer_id(order)
-        if customer_id == "":
-            return
-        
-        line_items = await fetch_line_items(order)
-        discount = await calculate_discount(order, line_items)
-        
-        shipping_charge = 0.0
-        try:
-            shipping_total = float(order["shipping_total"]) if order["shipping_total"] else 0.0
-            shipping_tax = float(order["shipping_tax"]) if order["shipping_tax"] else 0.0
-            shipping_charge = shipping_total + shipping_tax
-        except (ValueError, TypeError):
-            shipping_charge = 0.0
-        
-        delivery_method = ""
-        try:
-            if len(order["shipping_lines"]) > 0:
-                delivery_method = order["shipping_lines"][0]["method_title"]
-            else:
-                delivery_method = "Pickup"
-        except (ValueError, TypeError):
-            delivery_method = "Pickup"
-        
-        tax_total = 0.0
-        try:
-            tax_total = float(order["total_tax"]) if order["total_tax"] else 0.0
-        except (ValueError, TypeError):
-            print(f"Invalid total_tax value, defaulting to 0")
-            tax_total = 0.0
-        
-        order_base = Order(
-            customer_id=customer_id,
-            date=order["date_created"].split('T')[0],
-            shipment_date=order["date_completed"].split('T')[0],
-            reference_number=str(order["id"]),
-            line_items=line_items,
-            notes=order["customer_note"],
-            discount=discount,
-            is_discount_before_tax=True,
-            discount_type="entity_level",
-            shipping_charge=shipping_charge,
-            delivery_method=delivery_method,
-            status="Confirmed",
-            tax_total=tax_total
-        )
-        
-        result = await ZohoAgent().create_order(order_base)
-        if result.get("salesorder", {}).get("status") == "draft":
-            print("Draft order created")
-            confirmed_result = await ZohoAgent().mark_order_as_confirmed(result.get("salesorder", {}).get("salesorder_id"))
-            print(confirmed_result)
-        
-        return
-    except KeyError as e:
-        print(f"Missing required field in order: {str(e)}")
-        return
-    except Exception as e:
-        print(f"Unexpected error processing order: {str(e)}")
-        return
\ No newline at end of file
+    await sync_order(order)
@@ -0,0 +1,66 @@
+import asyncio
+from typing import AsyncIterable, Awaitable, Callable, Iterable
+
+class Stage:
+    """One pipeline step: `fn` runs on `workers` concurrent tasks; returning None drops the item."""
+    def __init__(self, name: str, fn: Callable[[object], Awaitable[object | None]], workers: int):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.passed = 0
+        self.dropped = 0
+        self.failed = 0
+        # Items whose `fn` raised, for callers that need to know exactly what didn't get through
+        self.failed_items = []
+
+async def run_pipeline(source: Iterable | AsyncIterable, stages: list[Stage], queue_size: int = 100) -> list[Stage]:
+    """Push every item of `source` through `stages`, with a bounded queue in front of each stage.
+
+    A full queue blocks the stage before it, so a slow step (e.g. a rate-limited API call)
+    throttles the whole pipeline instead of piling up work in memory.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+
+    async def work(index: int, stage: Stage):
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        while True:
+            item = await inbox.get()
+            try:
+                result = await stage.fn(item)
+                if result is None:
+                    stage.dropped += 1
+                else:
+                    stage.passed += 1
+                    if outbox is not None:
+                        await outbox.put(result)
+            except Exception as e:
+                stage.failed += 1
+                stage.failed_items.append(item)
+                print(f"{stage.name} failed: {str(e)}")
+            finally:
+                inbox.task_done()
+
+    workers = [
+        asyncio.create_task(work(index, stage))
+        for index, stage in enumerate(stages)
+        for _ in range(stage.workers)
+    ]
+    try:
+        if hasattr(source, "__aiter__"):
+            async for item in source:
+                await queues[0].put(item)
+        else:
+            for item in source:
+                await queues[0].put(item)
+        # Each queue is only drained for good once everything upstream of it has finished
+        for queue in queues:
+            await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    for stage in stages:
+        print(f"{stage.name}: {stage.passed} passed, {stage.dropped} dropped, {stage.failed} failed")
+    return stages
@@ -0,0 +1,86 @@
+import unicodedata
+from typing import Iterable
+
+from app.schemas.reconcile import ReconcileEntry, ReconcileReport, ReconcileStatus
+from app.store.catalog import catalog
+from app.store.snapshot import SnapshotWriter
+from app.store.zoho_item import ZohoItemRecord, load_zoho_items
+
+def normalise_name(name: str | None) -> str:
+    return " ".join(unicodedata.normalize("NFKC", name or "").casefold().split())
+
+def normalise_sku(sku: str | None) -> str:
+    return (sku or "").strip().casefold()
+
+class ItemIndex:
+    """Hashed lookups of Zoho items by normalised name and SKU; the first item wins on collisions."""
+    def __init__(self, items: Iterable[ZohoItemRecord]):
+        self.by_name: dict[str, ZohoItemRecord] = {}
+        self.by_sku: dict[str, ZohoItemRecord] = {}
+        self.count = 0
+        for item in items:
+            self.count += 1
+            name = normalise_name(item.name)
+            if name:
+                self.by_name.setdefault(name, item)
+            sku = normalise_sku(item.sku)
+            if sku:
+                self.by_sku.setdefault(sku, item)
+
+    def classify(self, product: dict) -> ReconcileEntry:
+        name = normalise_name(product.get("name"))
+        sku = normalise_sku(product.get("sku"))
+        by_sku = self.by_sku.get(sku) if sku else None
+        by_name = self.by_name.get(name) if name else None
+
+        if by_sku is not None:
+            # The SKU is the identity; a differing name means the item was renamed on one side
+            item = by_sku
+            status = ReconcileStatus.SYNCED if normalise_name(item.name) == name else ReconcileStatus.NAME_MISMATCH
+        elif by_name is not None:
+            item = by_name
+            status = ReconcileStatus.SKU_MISMATCH
+        else:
+            item = None
+            status = ReconcileStatus.MISSING
+
+        return ReconcileEntry(
+            woo_id=product["id"],
+            name=product.get("name") or "",
+            sku=product.get("sku") or "",
+            status=status,
+            zoho_item_id=item.item_id if item else None,
+            zoho_name=item.name if item else None,
+            zoho_sku=item.sku if item else None,
+        )
+
+def reconcile_items(products: Iterable[dict] | None = None, report_path: str = "repairs/reconcile_report.json") -> ReconcileReport:
+    """Classify every Woo product against the Zoho item mirror.
+
+    Entries that are not synced go to the repairs/reconcile_entries snapshot. Missing products go in
+    full to repairs/unsynced_items for sync_unsynced_items. The summary is written to `report_path`.
+    """
+    index = ItemIndex(load_zoho_items())
+    if products is None:
+        products = catalog.scan("woo_products", where={"type": "simple"})
+
+    counts = {status: 0 for status in ReconcileStatus}
+    with SnapshotWriter("repairs/reconcile_entries") as entries, SnapshotWriter("repairs/unsynced_items") as unsynced:
+        for product in products:
+            entry = index.classify(product)
+            counts[entry.status] += 1
+            if entry.status != ReconcileStatus.SYNCED:
+                entries.write(entry.model_dump(mode="json"))
+            if entry.status == ReconcileStatus.MISSING:
+                unsynced.write(product)
+
+    report = ReconcileReport(
+        products=sum(counts.values()),
+        zoho_items=index.count,
+        counts=counts,
+        entries=entries.path,
+        unsynced_items=unsynced.path,
+    )
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(report.model_dump_json(indent=4))
+    return report
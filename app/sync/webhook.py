@@ -0,0 +1,69 @@
+import asyncio, base64, hashlib, hmac
+
+from app.config import settings
+from app.store.catalog import catalog
+from app.sync.order import sync_order
+
+def verify_signature(body: bytes, signature: str | None) -> bool:
+    """Check WooCommerce's X-WC-Webhook-Signature: base64 HMAC-SHA256 of the raw body with the webhook secret."""
+    if not settings.WCM_WEBHOOK_SECRET or not signature:
+        return False
+    digest = hmac.new(settings.WCM_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode("ascii"), signature)
+
+class OrderWebhookQueue:
+    """In-process queue of order payloads that keeps only the latest payload per order id.
+
+    Repeated updates of an order that is still waiting replace its payload instead of queueing it
+    again, and an order is never handled by two workers at once.
+    """
+    def __init__(self):
+        self.pending: dict[int, dict] = {}
+        self.in_flight: set[int] = set()
+        self.queue: asyncio.Queue[int] = asyncio.Queue()
+
+    def put(self, order: dict) -> bool:
+        """Queue `order`; returns False when it was coalesced into an update already waiting."""
+        order_id = order["id"]
+        coalesced = order_id in self.pending
+        self.pending[order_id] = order
+        # An order being handled is re-queued by its worker once it finishes
+        if not coalesced and order_id not in self.in_flight:
+            self.queue.put_nowait(order_id)
+        return not coalesced
+
+    async def worker(self, handle):
+        while True:
+            order_id = await self.queue.get()
+            order = self.pending.pop(order_id, None)
+            if order is None:
+                self.queue.task_done()
+                continue
+            self.in_flight.add(order_id)
+            try:
+                await handle(order)
+            except Exception as e:
+                print(f"Error handling webhook for order {order_id}: {str(e)}")
+            finally:
+                self.in_flight.discard(order_id)
+                if order_id in self.pending:
+                    self.queue.put_nowait(order_id)
+                self.queue.task_done()
+
+    async def run(self, handle, workers: int):
+        await asyncio.gather(*(self.worker(handle) for _ in range(max(1, workers))))
+
+order_webhook_queue = OrderWebhookQueue()
+
+async def handle_order_webhook(order: dict):
+    # order.deleted only carries the id
+    if "status" not in order:
+        return
+    # Stored whatever the status, so an order refunded or cancelled after completion drops out of the completed scans
+    await asyncio.to_thread(catalog.upsert, "woo_orders", [order])
+    if order["status"] != "completed":
+        return
+    await sync_order(order)
+
+async def process_order_webhooks():
+    await order_webhook_queue.run(handle_order_webhook, settings.WCM_WEBHOOK_WORKERS)